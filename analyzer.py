@@ -1,6 +1,6 @@
 import os
-import math
-from collections import Counter
+from engine_v3.kernels import byte_stats
+from feature_cache import FeatureCache
 
 def shannon_entropy(data):
     """
@@ -8,25 +8,39 @@ def shannon_entropy(data):
     Higher entropy (close to 8.0) means the data is already compressed/encrypted.
     Lower entropy means it is highly compressible.
     """
-    if not data:
-        return 0
-    entropy = 0
-    counts = Counter(data)
-    for count in counts.values():
-        p_x = count / len(data)
-        entropy -= p_x * math.log2(p_x)
-    return entropy
+    return byte_stats(data)['entropy']
 
 from PIL import Image
 
-def sample_features(file_path, sample_kb=64):
+_cache = None
+
+def get_feature_cache():
+    """Process-wide FeatureCache, opened on first use."""
+    global _cache
+    if _cache is None:
+        _cache = FeatureCache()
+    return _cache
+
+def sample_features(file_path, sample_kb=64, use_cache=True):
     """
     Analyzes a file using statistical and VISUAL heuristics.
+    Results are cached per (path, size, mtime, inode), so re-scanning unchanged files is a lookup.
     """
     if not os.path.exists(file_path) or os.path.isdir(file_path):
         return None
-        
-    size = os.path.getsize(file_path)
+
+    st = os.stat(file_path)
+    if use_cache:
+        cached = get_feature_cache().get(file_path, sample_kb, st)
+        if cached is not None:
+            return cached
+
+    features = _compute_features(file_path, st.st_size, sample_kb)
+    if use_cache and features is not None:
+        get_feature_cache().put(file_path, sample_kb, st, features)
+    return features
+
+def _compute_features(file_path, size, sample_kb):
     ext = file_path.lower().split('.')[-1]
     
     # --- VISUAL INTELLIGENCE ---
@@ -54,17 +68,17 @@ def sample_features(file_path, sample_kb=64):
     if not sample:
         return {'entropy': 0, 'size_bytes': size, 'is_text': False, 'repetition': 0, 'compressible': False}
 
-    # 1. Calculate Shannon Entropy (0.0 to 8.0)
-    entropy = shannon_entropy(sample)
+    # 1. Calculate Shannon Entropy (0.0 to 8.0) + byte classes in one histogram pass
+    stats = byte_stats(sample)
+    entropy = stats['entropy']
     
     # 2. Structural Repetition (4-byte sliding window)
     chunks = [sample[i:i+4] for i in range(0, len(sample) - 3, 4)]
     repetition_ratio = 1.0 - (len(set(chunks)) / len(chunks)) if chunks else 0
     
     # 3. Robust Text vs Binary detection
-    null_count = sample.count(0)
-    text_chars = sum(1 for c in sample if 32 <= c <= 126 or c in (9,10,13))
-    text_ratio = text_chars / len(sample)
+    null_count = stats['null_count']
+    text_ratio = stats['printable_ratio']
     
     # Heuristic for text: High printable ratio AND low null-byte count
     is_text = text_ratio > 0.8 and null_count < (len(sample) * 0.01)
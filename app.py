@@ -31,9 +31,10 @@ class AdaptiveCompressUI(ctk.CTk):
         # --- Run Engine Validation ---
         self.validate_engines()
         
-        threading.Thread(target=selector.calibrate_speeds, 
-                         args=({"zstd": os.path.join(self.manager.bin, "zstd.exe")},), 
-                         daemon=True).start()
+        if self.manager.available("zstd"):
+            threading.Thread(target=selector.calibrate_speeds, 
+                             args=({"zstd": self.manager.bins["zstd"]},), 
+                             daemon=True).start()
 
         # --- Window Setup ---
         self.title("Adaptive Engine | 2026 Eco-Ready")
@@ -112,12 +113,12 @@ class AdaptiveCompressUI(ctk.CTk):
 
     # --- Utilities ---
     def validate_engines(self):
-        """Check if engines exist in the bin folder on startup."""
-        bin_dir = os.path.join(self.script_dir, "bin")
-        required = ["7za.exe", "zstd.exe", "zpaq.exe"]
-        missing = [exe for exe in required if not os.path.exists(os.path.join(bin_dir, exe))]
+        """Check that the core engines resolve (bin folder or system PATH) on startup."""
+        required = ["7zip", "zstd", "paq"]
+        missing = [tool for tool in required if not self.manager.available(tool)]
         if missing:
-            messagebox.showwarning("Missing Engines", f"The following engines are missing in {bin_dir}:\n" + "\n".join(missing))
+            messagebox.showwarning("Missing Engines", f"The following engines are missing in {self.manager.bin} "
+                                   "and on the system PATH:\n" + "\n".join(missing))
 
     def get_simulated_latency(self): return random.randint(20, 350)
     
@@ -270,6 +271,21 @@ class AdaptiveCompressUI(ctk.CTk):
     # --- PIPELINE ---
     def run_pipeline(self, path):
         try:
+            if os.path.isdir(path) and self.force_tool.get() == "V3 (Super-Block)":
+                # V3 packs the whole tree (sub-folders included) into one container
+                v3 = AdaptiveEngineV3(os.path.join(self.script_dir, "bin"), workers="auto",
+                                      selection="trial", priority=self.mode.get())
+                output_archive = os.path.normpath(path) + ".adaptive"
+                try:
+                    self.log(f"› V3 Pipeline started for folder {os.path.basename(os.path.normpath(path))}")
+                    v3.compress_file(path, output_archive)
+                    self.log(f"› SUCCESS: Saved to {output_archive}")
+                    os.system(f'explorer /select,"{os.path.normpath(output_archive)}"')
+                except Exception as e:
+                    self.log(f"› V3 Critical Fail: {str(e)}")
+                self.log("Pipeline Finished.")
+                return
+
             targets = [os.path.join(path, f) for f in os.listdir(path) if os.path.isfile(os.path.join(path, f))] if os.path.isdir(path) else [path]
 
             for item in targets:
@@ -286,7 +302,7 @@ class AdaptiveCompressUI(ctk.CTk):
                     
                     if ext == 'adaptive':
                         # Use V3 Decompressor
-                        v3 = AdaptiveEngineV3(os.path.join(self.script_dir, "bin"))
+                        v3 = AdaptiveEngineV3(os.path.join(self.script_dir, "bin"), workers="auto")
                         try:
                             self.log("› Initializing V3 Pipeline...")
                             final_out = v3.decompress_file(item, output_folder)
@@ -297,9 +313,11 @@ class AdaptiveCompressUI(ctk.CTk):
                         continue
                     
                     # GET COMMAND FROM MANAGER
+                    ext = self.manager.archive_format(item) # zstd output is also named .adapt
                     cmd = self.manager.get_decompress_command(item, dest_path, ext)
                     if not cmd:
-                        self.log(f"› Unsupported format: {ext}")
+                        engine = self.manager.decompressor_for(ext)
+                        self.log(f"› Engine unavailable: {engine}" if engine else f"› Unsupported format: {ext}")
                         continue
                         
                     # RUNNER handles clean slate and existence checks
@@ -320,7 +338,8 @@ class AdaptiveCompressUI(ctk.CTk):
                 choice = self.force_tool.get()
                 
                 if choice == "V3 (Super-Block)":
-                    v3 = AdaptiveEngineV3(os.path.join(self.script_dir, "bin"))
+                    v3 = AdaptiveEngineV3(os.path.join(self.script_dir, "bin"), workers="auto",
+                                          selection="trial", priority=self.mode.get())
                     output_archive = item + ".adaptive"
                     try:
                         self.log(f"› V3 Pipeline started for {filename}")
@@ -347,6 +366,9 @@ class AdaptiveCompressUI(ctk.CTk):
                 }
                 output_archive = item + ext_map.get(best_tool, ".adapt")
                 comp_cmd = self.manager.get_command(best_tool, item, output_archive, level=self.mode.get())
+                if comp_cmd is None:
+                    self.log(f"› Engine unavailable: {best_tool} (skipping {filename})")
+                    continue
                 
                 # --- FIX: INCREASE TIMEOUT FOR VIDEO ---
                 timeout = 3600 if best_tool == "ffmpeg" else 120
@@ -358,17 +380,15 @@ class AdaptiveCompressUI(ctk.CTk):
                     os.system(f'explorer /select,"{os.path.normpath(output_archive)}"')
                     
                     # --- PROJECT UPGRADE: DATABASE LOGGING ---
+                    # Also feeds the selector's learned speed/ratio model
                     on_battery, _ = selector.get_battery_status()
-                    from metadata import CompressionDB
-                    db = CompressionDB()
-                    db.log_run(
-                        filename=filename,
-                        orig_size=stats['size_bytes'],
-                        comp_size=comp_result['output_size'],
-                        entropy=stats['entropy'],
+                    selector.record_run(
+                        stats,
                         engine=best_tool,
+                        comp_size=comp_result['output_size'],
                         duration=comp_result['time'],
-                        eco_mode=on_battery
+                        eco_mode=on_battery,
+                        filename=filename
                     )
                 else:
                     self.log(f"› Fail: {comp_result.get('error')}")
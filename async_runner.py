@@ -0,0 +1,186 @@
+import asyncio
+import os
+import re
+import subprocess
+import time
+
+import runner
+
+# zstd and 7za redraw their progress with '\r', so both '\r' and '\n' end a line
+PROGRESS_RE = re.compile(rb'(\d{1,3}(?:\.\d+)?)\s*%')
+NO_WINDOW = subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+
+
+class AsyncRunner:
+    """
+    asyncio counterpart of runner.run_compressor for driving many engine
+    processes from one event loop.
+
+    At most `concurrency` processes run at once (jobs beyond that wait on a
+    semaphore, holding no thread). Every job has its own timeout. Cancelling a
+    job's task kills its process. Results are the same dicts run_compressor
+    returns, and verify policies work the same way ("deferred" goes to
+    runner's background VerifyQueue).
+    """
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or os.cpu_count() or 1
+        self._semaphore = None # created lazily inside the running loop
+
+    @property
+    def semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def run_compressor(self, cmd, input_path, output_path, timeout=120, verify="full",
+                             on_verified=None, on_progress=None):
+        """
+        on_progress(percent, line) is called (on the loop) for every percentage
+        the engine prints on stdout/stderr.
+        """
+        async with self.semaphore:
+            return await self._run(cmd, output_path, timeout, verify, on_verified, on_progress)
+
+    async def verify_integrity(self, binary_path, archive_path, timeout=30):
+        """Async runner.verify_integrity: (ok, message)."""
+        async with self.semaphore:
+            return await self._verify(binary_path, archive_path, timeout)
+
+    async def run_many(self, jobs):
+        """
+        Runs run_compressor(**job) for every job dict concurrently (bounded by the
+        semaphore) and returns the results in job order. A job that raises
+        yields a failure dict instead of aborting the others.
+        """
+        results = await asyncio.gather(*(self.run_compressor(**job) for job in jobs), return_exceptions=True)
+        return [r if isinstance(r, dict) else {"success": False, "error": f"Runner Error: {str(r)}"}
+                for r in results]
+
+    async def _run(self, cmd, output_path, timeout, verify, on_verified, on_progress):
+        start_time = time.time()
+        if not cmd:
+            return {"success": False, "error": runner.ENGINE_UNAVAILABLE_ERROR}
+        binary_path = cmd[0]
+        cmd_for_log = ' '.join([f'"{arg}"' if ' ' in arg else str(arg) for arg in cmd])
+
+        try:
+            # Filesystem helpers can block (probe writes, rmtree): keep them off the loop
+            if not await self._in_thread(self._prepare_output, output_path):
+                return {"success": False, "error": runner.ACCESS_DENIED_ERROR}
+
+            returncode, std_out, err_out = await self._exec(cmd, timeout, on_progress)
+
+            if returncode == 0 and await self._wait_for_output(output_path):
+                verify = runner.verify_mode(verify, binary_path)
+                if verify == "full":
+                    success, msg = await self._verify(binary_path, output_path, 30)
+                    if not success:
+                        return {"success": False, "error": f"Integrity Fail: {msg}"}
+                elif verify == "deferred":
+                    runner.get_verify_queue().submit(binary_path, output_path, on_verified)
+
+                output_size = await self._in_thread(os.path.getsize, output_path)
+                return {
+                    "success": True,
+                    "time": time.time() - start_time,
+                    "output_size": output_size,
+                    "final_path": output_path,
+                    "verify": verify
+                }
+
+            # No diagnostics on stdout: callers may be streaming JSON lines there
+            full_err = f"{err_out}\n{std_out}".strip()
+            return {"success": False, "error": f"Engine Fail: {full_err[:100]}"}
+
+        except asyncio.TimeoutError:
+            return {"success": False, "error": f"Runner Error: Command '{cmd_for_log}' timed out after {timeout} seconds"}
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return {"success": False, "error": f"Runner Error: {str(e)}"}
+
+    @staticmethod
+    async def _in_thread(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    @staticmethod
+    def _prepare_output(output_path):
+        """Worker-thread part of a run: create the folder, probe it, clear a stale output."""
+        out_dir = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(out_dir, exist_ok=True)
+        if not runner.check_writable(out_dir):
+            return False
+        runner.clear_output(output_path)
+        return True
+
+    @staticmethod
+    async def _wait_for_output(output_path, timeout=0.5, step=0.02):
+        """runner.wait_for_output, polling with asyncio.sleep so other jobs keep running."""
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(output_path):
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(step)
+        return True
+
+    async def _verify(self, binary_path, archive_path, timeout):
+        if not os.path.exists(archive_path):
+            return (False, "File missing.")
+        test_cmd = runner.integrity_command(binary_path, archive_path)
+        if test_cmd is None:
+            return (True, "Skip: Not an archive.")
+        try:
+            returncode, std_out, err_out = await self._exec(test_cmd, timeout)
+            return (returncode == 0, (err_out or std_out or "").strip())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return (False, f"Integrity Crash: {str(e) or type(e).__name__}")
+
+    async def _exec(self, cmd, timeout, on_progress=None):
+        """(returncode, stdout, stderr) as text; kills the process on timeout or cancellation."""
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, creationflags=NO_WINDOW
+        )
+        drains = [asyncio.ensure_future(self._drain(process.stdout, on_progress)),
+                  asyncio.ensure_future(self._drain(process.stderr, on_progress))]
+        try:
+            await asyncio.wait_for(process.wait(), timeout)
+            std_out, err_out = await asyncio.gather(*drains)
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            for drain in drains:
+                drain.cancel()
+            await asyncio.gather(*drains, return_exceptions=True)
+            raise
+        return process.returncode, std_out, err_out
+
+    @staticmethod
+    async def _drain(stream, on_progress):
+        """Reads a pipe to EOF, reporting progress percentages as they appear."""
+        captured = bytearray()
+        pending = b""
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            captured += chunk
+            if on_progress is None:
+                continue
+            *lines, pending = re.split(rb'[\r\n]', pending + chunk)
+            for line in lines:
+                match = PROGRESS_RE.search(line)
+                if match:
+                    on_progress(min(float(match.group(1)), 100.0), line.decode('utf-8', errors='replace').strip())
+        return captured.decode('utf-8', errors='replace')
+
+
+async def run_compressor(cmd, input_path, output_path, timeout=120, verify="full", on_verified=None,
+                         on_progress=None):
+    """One-off async run_compressor (unbounded; use an AsyncRunner to cap concurrency)."""
+    return await AsyncRunner(1).run_compressor(cmd, input_path, output_path, timeout, verify,
+                                               on_verified, on_progress)
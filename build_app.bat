@@ -4,7 +4,7 @@ echo   ADAPTIVE COMPRESSION - PROFESSIONAL BUILD TOOL
 echo ===================================================
 
 echo [1/4] Installing dependencies...
-python -m pip install pyinstaller customtkinter psutil Pillow zstandard lz4
+python -m pip install pyinstaller customtkinter psutil Pillow zstandard lz4 numpy
 
 echo [2/4] Cleaning old build data...
 if exist dist rmdir /s /q dist
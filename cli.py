@@ -0,0 +1,305 @@
+"""
+Headless command line for the compression suite (no GUI imports, safe on Linux servers).
+
+    python -m cli analyze    PATH...                      features per file
+    python -m cli compress   PATH... [--engine auto|v3|zstd|7zip|paq|webp|ffmpeg|tar]
+    python -m cli decompress ARCHIVE... [-o DIR]
+    python -m cli verify     ARCHIVE...
+    python -m cli benchmark  PATH... [--engines v3,zstd,7zip]
+
+Every result is one line: human-readable by default, one JSON object per line
+with --jsonl. Exit code: 0 all succeeded, 1 at least one item failed, 2 usage error.
+Heavy modules are imported by the subcommand that needs them, so startup stays fast.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+EXIT_OK, EXIT_FAILED, EXIT_USAGE = 0, 1, 2
+ENGINES = ["zstd", "7zip", "paq", "webp", "ffmpeg", "tar"]
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bin")
+
+
+class Reporter:
+    """Emits one record per event; JSON lines or a short text line."""
+
+    def __init__(self, jsonl=False):
+        self.jsonl = jsonl
+        self.failures = 0
+        self.stream = sys.stdout # quiet() redirects sys.stdout; records still go here
+
+    def emit(self, event, **fields):
+        if fields.get("success") is False and not fields.get("skipped"):
+            self.failures += 1
+        if self.jsonl:
+            print(json.dumps({"event": event, **fields}, default=str), file=self.stream, flush=True)
+        else:
+            status = "" if "success" not in fields else ("OK   " if fields["success"] else "FAIL ")
+            detail = " ".join(f"{k}={v}" for k, v in fields.items() if k not in ("success", "path"))
+            print(f"{status}{event:<10} {fields.get('path', '')} {detail}".rstrip(), file=self.stream, flush=True)
+
+    @contextlib.contextmanager
+    def quiet(self):
+        """Engine chatter (print) goes to stderr so it never corrupts the JSON-lines stream."""
+        if self.jsonl:
+            with contextlib.redirect_stdout(sys.stderr):
+                yield
+        else:
+            yield
+
+    @property
+    def exit_code(self):
+        return EXIT_FAILED if self.failures else EXIT_OK
+
+
+def iter_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, names in os.walk(path):
+                for name in sorted(names):
+                    yield os.path.join(dirpath, name)
+        else:
+            yield path
+
+
+def unavailable_engines(engines):
+    """Engines (other than v3) whose binary is neither in bin/ nor on the PATH."""
+    from compressor_manager import CompressorManager
+    manager = CompressorManager()
+    return [engine for engine in engines if engine != "v3" and not manager.available(engine)]
+
+
+def make_v3(args, profiler=None):
+    from engine_v3.core import AdaptiveEngineV3
+    return AdaptiveEngineV3(BIN_DIR, workers=args.workers, selection="trial", priority=args.priority,
+                            profiler=profiler)
+
+
+# --- Subcommands ---
+
+def cmd_analyze(args, out):
+    import analyzer
+    for path in iter_files(args.paths):
+        stats = analyzer.sample_features(path, use_cache=not args.no_cache)
+        if stats is None:
+            out.emit("analyze", path=path, success=False, error="Unreadable file.")
+        else:
+            out.emit("analyze", path=path, success=True, features=stats)
+
+
+def cmd_compress(args, out):
+    if args.base and (args.engine != "v3" or len(args.paths) != 1):
+        print("error: --base needs --engine v3 and a single input", file=sys.stderr)
+        return EXIT_USAGE
+    if (args.profile or args.profile_json) and args.engine != "v3":
+        print("error: --profile needs --engine v3", file=sys.stderr)
+        return EXIT_USAGE
+    if args.engine == "v3":
+        from engine_v3.instrument import StageProfiler
+        profiles = {}
+        # One container per argument: a folder becomes a single tree archive
+        for path in args.paths:
+            archive = os.path.normpath(path) + ".adaptive"
+            profiler = StageProfiler() if args.profile or args.profile_json else None
+            start = time.time()
+            try:
+                with out.quiet():
+                    make_v3(args, profiler).compress_file(path, archive, base=args.base)
+                out.emit("compress", path=path, success=True, tool="v3", output=archive,
+                         output_size=os.path.getsize(archive), time=round(time.time() - start, 3))
+            except Exception as e:
+                out.emit("compress", path=path, success=False, tool="v3", error=str(e))
+            if profiler:
+                profiles[path] = profiler.report()
+                out.emit("profile", path=path, **profiles[path])
+        if profiles and args.profile_json:
+            with open(args.profile_json, "w", encoding="utf-8") as f:
+                json.dump(profiles, f, indent=2)
+        return
+
+    if args.engine != "auto" and unavailable_engines([args.engine]):
+        print(f"error: engine {args.engine} is unavailable (not in {BIN_DIR} or on PATH)", file=sys.stderr)
+        return EXIT_FAILED
+
+    from pipeline import BatchPipeline
+    batch = BatchPipeline(workers=args.workers if args.workers != "auto" else None, priority=args.priority,
+                          force_tool=None if args.engine == "auto" else args.engine, verify=args.verify)
+
+    def report(result):
+        fields = {k: result.get(k) for k in ("path", "tool", "success", "skipped", "error", "output_size", "time")
+                  if result.get(k) is not None}
+        if result.get("success"):
+            fields["output"] = result.get("final_path")
+        out.emit("compress", **fields)
+
+    with out.quiet():
+        results = batch.run(args.paths, on_result=report)
+    # Deferred tests finish after the compress events were printed
+    for result in results:
+        if result.get("verify") == "deferred" and not result.get("success"):
+            out.emit("verify", path=result["final_path"], success=False, message=result.get("error"))
+
+
+def decompress_one(path, out_dir, args, out):
+    ext = path.lower().rsplit('.', 1)[-1]
+    out_dir = os.path.abspath(out_dir or os.path.dirname(path))
+    if ext == "adaptive":
+        with out.quiet():
+            restored = make_v3(args).decompress_file(path, out_dir)
+        return {"success": True, "output": restored}
+
+    import runner
+    from compressor_manager import CompressorManager
+    manager = CompressorManager()
+    ext = manager.archive_format(path)
+    dest = os.path.join(out_dir, os.path.basename(path).rsplit('.', 1)[0])
+    cmd = manager.get_decompress_command(path, dest, ext)
+    if not cmd:
+        engine = manager.decompressor_for(ext)
+        return {"success": False, "error": f"Engine unavailable: {engine}" if engine else f"Unsupported format: {ext}"}
+    result = runner.run_compressor(cmd, path, dest)
+    return {"success": bool(result.get("success")), "output": dest, "error": result.get("error")}
+
+
+def cmd_decompress(args, out):
+    for path in args.paths:
+        try:
+            result = decompress_one(path, args.output_dir, args, out)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        out.emit("decompress", path=path, **{k: v for k, v in result.items() if v is not None})
+
+
+def verify_one(path, args):
+    """(ok, message) for one archive."""
+    ext = path.lower().rsplit('.', 1)[-1]
+    if ext == "adaptive":
+        report = make_v3(args).verify_file(path, structural=args.structural)
+        if report['ok']:
+            checked = "spans checked" if args.structural else f"{report['decoded']} blocks CRC-verified"
+            return True, f"{report['blocks']} blocks, {checked}."
+        problems = report['errors'] + [f"block {c['id']} ({c['reason']}) at archive bytes "
+                                       f"{c['archive_range'][0]}-{c['archive_range'][1]}" for c in report['corrupt']]
+        return False, "; ".join(problems)
+
+    import runner
+    from compressor_manager import CompressorManager
+    ext = CompressorManager.archive_format(path)
+    engine = {"7z": "7zip", "adapt": "7zip", "zst": "zstd", "zpaq": "paq", "paq": "paq"}.get(ext)
+    if engine is None:
+        return False, f"Cannot verify .{ext} archives."
+    binary = CompressorManager().bins[engine]
+    if binary is None:
+        return False, f"Engine unavailable: {engine}"
+    return runner.verify_integrity(binary, path)
+
+
+def cmd_verify(args, out):
+    for path in args.paths:
+        try:
+            ok, message = verify_one(path, args)
+        except Exception as e:
+            ok, message = False, str(e)
+        out.emit("verify", path=path, success=ok, message=message)
+
+
+def cmd_benchmark(args, out):
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    # One record per missing engine rather than a failed run per file
+    for engine in unavailable_engines(engines):
+        out.emit("benchmark", tool=engine, success=False, error=f"Engine unavailable: {engine}")
+        engines.remove(engine)
+    for path in iter_files(args.paths):
+        size = os.path.getsize(path)
+        for engine in engines:
+            tmp_dir = tempfile.mkdtemp(prefix="adaptive_bench_")
+            try:
+                start = time.time()
+                if engine == "v3":
+                    archive = os.path.join(tmp_dir, os.path.basename(path) + ".adaptive")
+                    with out.quiet():
+                        make_v3(args).compress_file(path, archive)
+                    result = {"success": True, "output_size": os.path.getsize(archive)}
+                else:
+                    import runner
+                    from pipeline import EXT_MAP
+                    from compressor_manager import CompressorManager
+                    archive = os.path.join(tmp_dir, os.path.basename(path) + EXT_MAP.get(engine, ".adapt"))
+                    cmd = CompressorManager().get_command(engine, path, archive, level=args.priority)
+                    result = runner.run_compressor(cmd, path, archive, verify="none")
+                elapsed = time.time() - start
+                if result.get("success"):
+                    out.emit("benchmark", path=path, tool=engine, success=True, size=size,
+                             output_size=result["output_size"],
+                             ratio=round(result["output_size"] / size, 4) if size else None,
+                             time=round(elapsed, 3), mbps=round(size / 1048576 / max(elapsed, 1e-6), 2))
+                else:
+                    out.emit("benchmark", path=path, tool=engine, success=False, error=result.get("error"))
+            except Exception as e:
+                out.emit("benchmark", path=path, tool=engine, success=False, error=str(e))
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def build_parser():
+    def workers(value):
+        return value if value == "auto" else int(value)
+
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Adaptive compression suite (headless).")
+    parser.add_argument("--jsonl", action="store_true", help="one JSON object per line on stdout")
+    parser.add_argument("--workers", type=workers, default="auto", help="parallel jobs / V3 block workers")
+    parser.add_argument("--priority", choices=["speed", "balanced", "size"], default="balanced")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("analyze", help="print sampled features per file")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--no-cache", action="store_true", help="bypass the feature cache")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("compress", help="compress files / folders")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--engine", choices=["auto", "v3"] + ENGINES, default="auto")
+    p.add_argument("--verify", choices=["full", "sampled", "deferred", "none"], default="sampled",
+                   help="post-run archive test policy (V3 blocks are always CRC-checked on read)")
+    p.add_argument("--base", help="previous .adaptive archive of the same input (v3 incremental mode)")
+    p.add_argument("--profile", action="store_true", help="v3: report per-stage time, bytes and codecs")
+    p.add_argument("--profile-json", metavar="FILE", help="v3: also save the stage reports as JSON")
+    p.set_defaults(func=cmd_compress)
+
+    p = sub.add_parser("decompress", help="restore archives")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-o", "--output-dir", help="destination folder (default: next to the archive)")
+    p.set_defaults(func=cmd_decompress)
+
+    p = sub.add_parser("verify", help="check archive integrity")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--structural", action="store_true",
+                   help=".adaptive only: check manifest and block spans without decoding")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("benchmark", help="compare engines on files (archives go to a temp dir)")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--engines", default="v3,zstd,7zip", help="comma separated, e.g. v3,zstd,7zip,paq")
+    p.set_defaults(func=cmd_benchmark)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    missing = [p for p in getattr(args, "paths", []) if not os.path.exists(p)]
+    if missing:
+        print(f"error: path not found: {', '.join(missing)}", file=sys.stderr)
+        return EXIT_USAGE
+    out = Reporter(args.jsonl)
+    status = args.func(args, out)
+    return out.exit_code if status is None else status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
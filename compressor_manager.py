@@ -1,6 +1,20 @@
 import os
 import sys
 
+from engine_v3.codecs import find_binary
+
+# Engine -> executable names, in preference order (bin/<name>.exe, bin/<name>, then PATH)
+BINARY_NAMES = {
+    "7zip": ("7za", "7z"),
+    "zstd": ("zstd",),
+    "paq": ("zpaq",),
+    "webp": ("cwebp",),
+    "ffmpeg": ("ffmpeg",),
+    "tar": ("tar",),
+}
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
 class CompressorManager:
     def __init__(self):
         # Handle the "Frozen" path (for PyInstaller) vs "Script" path
@@ -11,15 +25,13 @@ class CompressorManager:
         
         self.bin = os.path.join(base_path, "bin")
 
-        # --- Match EXACT binary names ---
-        self.bins = {
-            "7zip": os.path.join(self.bin, "7za.exe"),
-            "zstd": os.path.join(self.bin, "zstd.exe"),
-            "paq":  os.path.join(self.bin, "zpaq.exe"),
-            "webp": os.path.join(self.bin, "cwebp.exe"),
-            "ffmpeg": os.path.join(self.bin, "ffmpeg.exe"),
-            "tar":  "tar" # Windows built-in
-        }
+        # Bundled Windows builds first, then whatever the system has on PATH.
+        # Engines that cannot be found map to None (see available()).
+        self.bins = {tool: find_binary(self.bin, *names) for tool, names in BINARY_NAMES.items()}
+
+    def available(self, tool):
+        """True when the engine's binary was found."""
+        return self.bins.get(tool) is not None
 
     def _prepare_paths(self, *paths):
         """Standardize all paths for Windows engines."""
@@ -28,10 +40,12 @@ class CompressorManager:
     def get_command(self, tool, input_p, output_p, level="fast"):
         """Generates the command to COMPRESS a file."""
         exe_path = self.bins.get(tool)
-        if tool != "tar" and (not exe_path or not os.path.exists(exe_path)):
+        if not exe_path:
             # Fallback to 7zip if specialized tool missing
             tool = "7zip"
             exe_path = self.bins["7zip"]
+            if not exe_path:
+                return None
 
         input_p, output_p = self._prepare_paths(input_p, output_p)
 
@@ -63,33 +77,93 @@ class CompressorManager:
             
         return None
 
+    def get_stream_command(self, tool, level="fast", decompress=False, input_p=None, out_dir=None):
+        """
+        Generates a stdin -> stdout command for runner.iter_stream / run_stream.
+        tar is a producer (packs `input_p` to stdout) or, with decompress, a consumer
+        (unpacks stdin into `out_dir`). Returns None for engines that cannot stream:
+        zpaq archives are journaling and need a seekable file, cwebp/ffmpeg take paths.
+        """
+        exe_path = self.bins.get(tool)
+        if not exe_path:
+            return None
+
+        if tool == "zstd":
+            if decompress:
+                return [exe_path, "-d", "-c", "-q"]
+            z_level = "-3" if level == "fast" else "-19"
+            return [exe_path, z_level, "-c", "-q"]
+
+        elif tool == "7zip":
+            # The .7z container needs seeking, so the stream format is xz (LZMA2)
+            if decompress:
+                return [exe_path, "e", "-txz", "-si", "-so", "-y"]
+            mx = "-mx1" if level == "fast" else "-mx9"
+            return [exe_path, "a", "-txz", mx, "-an", "-si", "-so", "-y"]
+
+        elif tool == "tar":
+            if decompress:
+                out_dir = self._prepare_paths(out_dir or ".")[0]
+                return [exe_path, "-xf", "-", "-C", out_dir]
+            if not input_p:
+                return None
+            input_p = self._prepare_paths(input_p)[0]
+            return [exe_path, "-cf", "-", "-C", os.path.dirname(input_p), os.path.basename(input_p)]
+
+        return None
+
     def get_decompress_command(self, source, dest, ext):
-        """Generates the command to DECOMPRESS a file."""
+        """Generates the command to DECOMPRESS a file (None if unsupported or the engine is missing)."""
         source, dest = self._prepare_paths(source, dest)
         out_dir = os.path.dirname(dest)
+        exe_path = self.bins.get(self.decompressor_for(ext))
+        if not exe_path:
+            return None
 
         if ext in ["7z", "adapt"]:
-            return [self.bins["7zip"], "x", source, f"-o{out_dir}", "-aoa", "-spe", "-y"]
+            return [exe_path, "x", source, f"-o{out_dir}", "-aoa", "-spe", "-y"]
             
         elif ext == "zst":
-            return [self.bins["zstd"], "-d", source, "-o", dest, "-f"]
+            return [exe_path, "-d", source, "-o", dest, "-f"]
             
         elif ext in ["paq", "zpaq"]:
-            return [self.bins["paq"], "x", source, "-to", out_dir, "-force"]
+            return [exe_path, "x", source, "-to", out_dir, "-force"]
 
         elif ext == "webp":
-            dwebp = os.path.join(self.bin, "dwebp.exe")
-            return [dwebp, source, "-o", dest]
+            dwebp = find_binary(self.bin, "dwebp")
+            return [dwebp, source, "-o", dest] if dwebp else None
 
         elif ext == "mp4":
             # FFmpeg is its own decompressor (not strictly needed, but for completeness)
-            return [self.bins["ffmpeg"], "-i", source, "-y", dest]
+            return [exe_path, "-i", source, "-y", dest]
 
         elif ext == "tar":
-            return ["tar", "-xf", source, "-C", out_dir]
+            return [exe_path, "-xf", source, "-C", out_dir]
             
         return None
 
+    @staticmethod
+    def archive_format(path):
+        """
+        Extension naming the archive's real format. The GUI and BatchPipeline write
+        zstd output as .adapt (historically a 7-Zip extension), so .adapt is sniffed.
+        """
+        ext = path.lower().rsplit('.', 1)[-1]
+        if ext == "adapt":
+            try:
+                with open(path, "rb") as f:
+                    if f.read(len(ZSTD_MAGIC)) == ZSTD_MAGIC:
+                        return "zst"
+            except OSError:
+                pass
+        return ext
+
+    @staticmethod
+    def decompressor_for(ext):
+        """Engine that restores archives with extension `ext` (None if unknown)."""
+        return {"7z": "7zip", "adapt": "7zip", "zst": "zstd", "paq": "paq", "zpaq": "paq",
+                "webp": "webp", "mp4": "ffmpeg", "tar": "tar"}.get(ext)
+
     def get_test_command(self, tool_path, archive_path):
         """Generates the command to VERIFY an archive."""
         archive_path = os.path.normpath(os.path.abspath(archive_path))
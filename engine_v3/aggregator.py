@@ -6,13 +6,38 @@ class SuperBlock:
         self.chunks = []
         self.size = 0
         self.checksum = 0
+        # (offset, length) span in the source mapping while chunks stay contiguous
+        self.offset = None
+        self.source = None
+        self.contiguous = True
+        # [content_hash, size] of every chunk, in order (feeds the dedup index)
+        self.hashes = []
         
-    def add_chunk(self, data):
+    def add_chunk(self, data, offset=None, content_hash=None):
+        source = data.obj if isinstance(data, memoryview) else None
+        if not self.chunks:
+            self.offset, self.source = offset, source
+        elif (offset is None or self.offset is None or source is None or
+              source is not self.source or offset != self.offset + self.size):
+            self.contiguous = False
         self.chunks.append(data)
         self.size += len(data)
+        if content_hash is not None:
+            self.hashes.append([content_hash, len(data)])
+
+    def span(self):
+        """Zero-copy view over the whole block when its chunks are adjacent slices of one mapping."""
+        if len(self.chunks) == 1:
+            return self.chunks[0]
+        if self.contiguous and self.source is not None:
+            return memoryview(self.source)[self.offset:self.offset + self.size]
+        return None
         
     def finalize(self):
-        full_data = b''.join(self.chunks)
+        full_data = self.span()
+        if full_data is None:
+            # Non-adjacent chunks (or plain bytes): the one place a copy is unavoidable
+            full_data = b''.join(self.chunks)
         self.checksum = zlib.crc32(full_data) & 0xFFFFFFFF
         return full_data, self.checksum
 
@@ -24,45 +49,69 @@ class BlockAggregator:
     - 2 Efficiency Goals (Dictionary Reuse & Stream Continuity)
     
     Merges adjacent chunks of the same type into SuperBlocks for maximum compression density.
+    Blocks built from a memory-mapped slicer are emitted as (offset, length) spans of the
+    mapping ('data' is a memoryview), so no bytes are copied before the codec stage.
     """
     
     def __init__(self, max_block_size=8 * 1024 * 1024):
         self.max_block_size = max_block_size
         
-    def aggregate(self, chunk_stream):
+    def aggregate(self, chunk_stream, cut_before=None):
+        """
+        cut_before: optional set of chunk hashes that always open a new block (incremental
+        mode passes the first chunk of every base-archive block, so block boundaries
+        re-synchronise with the base after an insertion or deletion).
+        """
         current_block = None
         
         for chunk in chunk_stream:
             data = chunk['data']
             label = chunk['label']
+
+            # Deduplicated chunks are not stored again: close the open block
+            # (it may hold the first copy) and pass a reference marker through.
+            if chunk.get('duplicate'):
+                if current_block:
+                    yield self._emit(current_block)
+                    current_block = None
+                yield {
+                    'label': label,
+                    'duplicate_of': chunk['hash'],
+                    'checksum': zlib.crc32(data) & 0xFFFFFFFF,
+                    'size': len(data),
+                    'offset': chunk.get('offset')
+                }
+                continue
             
             # Start a new block if:
             # 1. No block exists
             # 2. Label changes
             # 3. Size limit reached
+            # 4. The chunk starts a block of the base archive
             if (not current_block or 
                 current_block.label != label or 
-                current_block.size + len(data) > self.max_block_size):
+                current_block.size + len(data) > self.max_block_size or
+                (cut_before and chunk.get('hash') in cut_before)):
                 
                 if current_block:
-                    block_data, crc = current_block.finalize()
-                    yield {
-                        'label': current_block.label,
-                        'data': block_data,
-                        'checksum': crc,
-                        'size': current_block.size
-                    }
+                    yield self._emit(current_block)
                 
                 current_block = SuperBlock(label)
             
-            current_block.add_chunk(data)
+            current_block.add_chunk(data, chunk.get('offset'), chunk.get('hash'))
             
         # Yield the final block
         if current_block:
-            block_data, crc = current_block.finalize()
-            yield {
-                'label': current_block.label,
-                'data': block_data,
-                'checksum': crc,
-                'size': current_block.size
-            }
+            yield self._emit(current_block)
+
+    @staticmethod
+    def _emit(block):
+        block_data, crc = block.finalize()
+        return {
+            'label': block.label,
+            'data': block_data,
+            'checksum': crc,
+            'size': block.size,
+            'offset': block.offset,
+            'chunks': block.hashes
+        }
@@ -0,0 +1,277 @@
+import os
+import bz2
+import lzma
+import zlib
+import shutil
+import tempfile
+import subprocess
+
+try:
+    import zstandard
+except ImportError:  # Optional: falls back to the zstd binary / stdlib codecs
+    zstandard = None
+
+# 0x08000000 = CREATE_NO_WINDOW (only meaningful, and only accepted, on Windows)
+NO_WINDOW = 0x08000000 if os.name == 'nt' else 0
+
+
+def find_binary(bin_dir, *names):
+    """Locates an engine binary: bundled bin/ first (.exe or bare), then the system PATH."""
+    for name in names:
+        for candidate in (os.path.join(bin_dir, name + '.exe'), os.path.join(bin_dir, name)):
+            if os.path.isfile(candidate):
+                return candidate
+    for name in names:
+        found = shutil.which(name)
+        if found:
+            return found
+    return None
+
+
+class Codec:
+    """
+    One compression backend. Works on buffers (bytes / memoryview) and returns bytes.
+    `tag` is the algo name recorded in the manifest and used to pick the decoder.
+    compress() returns None when the backend fails, mirroring the old binary bridge.
+    """
+    family = None
+    tag = None
+    in_process = True # False when the work happens in a child process (not in our CPU time)
+
+    def tag_for(self, level):
+        return self.tag
+
+    def compress(self, data, level):
+        raise NotImplementedError
+
+    def decompress(self, data):
+        raise NotImplementedError
+
+
+# --- In-process (library) backends: no temp files, no process spawn ---
+
+class ZstdLibCodec(Codec):
+    family, tag = 'zstd', 'ZSTD_T'
+
+    def compress(self, data, level):
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    def decompress(self, data):
+        # Frames written by the zstd binary from stdin omit the content size
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+class ZstdDictCodec(Codec):
+    """zstd against a trained dictionary; the dictionary bytes are passed with every call."""
+    family, tag = 'zstd_dict', 'ZSTD_D'
+
+    def __init__(self):
+        self._prepared = {} # dictionary bytes -> ZstdCompressionDict (digested once, not per block)
+
+    def __getstate__(self):
+        return {'_prepared': {}} # digested dictionaries are not picklable; process workers rebuild them
+
+    def _dict(self, dictionary):
+        prepared = self._prepared.get(dictionary)
+        if prepared is None:
+            if len(self._prepared) >= 16:
+                self._prepared.clear()
+            prepared = self._prepared[dictionary] = zstandard.ZstdCompressionDict(dictionary)
+        return prepared
+
+    def compress(self, data, level, dictionary):
+        return zstandard.ZstdCompressor(level=level, dict_data=self._dict(dictionary)).compress(data)
+
+    def decompress(self, data, dictionary):
+        return zstandard.ZstdDecompressor(dict_data=self._dict(dictionary)).decompress(data)
+
+    @staticmethod
+    def train(samples, dict_size):
+        # Explicit COVER parameters: the defaults tend to return a few-KB dictionary on log-like text
+        return zstandard.train_dictionary(dict_size, samples, k=1024, d=8).as_bytes()
+
+
+class LzmaCodec(Codec):
+    family, tag = 'lzma', 'LZMA'
+
+    def compress(self, data, level):
+        return lzma.compress(data, preset=level)
+
+    def decompress(self, data):
+        return lzma.decompress(data)
+
+
+class ZlibCodec(Codec):
+    family, tag = 'zlib', 'ZLIB'
+
+    def compress(self, data, level):
+        return zlib.compress(data, level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class Bz2Codec(Codec):
+    family, tag = 'bz2', 'BZ2'
+
+    def compress(self, data, level):
+        return bz2.compress(data, level)
+
+    def decompress(self, data):
+        return bz2.decompress(data)
+
+
+# --- Subprocess backends: the original zstd.exe / 7za.exe bridge ---
+
+class ZstdBinaryCodec(Codec):
+    family, tag = 'zstd', 'ZSTD_T'
+    in_process = False
+
+    def __init__(self, exe):
+        self.exe = exe
+
+    def _pipe(self, args, data):
+        result = subprocess.run([self.exe] + args, input=data, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, creationflags=NO_WINDOW, timeout=30)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode('utf-8', 'replace').strip())
+        return result.stdout
+
+    def compress(self, data, level):
+        try:
+            return self._pipe([f'-{level}', '-c', '-q'], data)
+        except Exception:
+            return None
+
+    def decompress(self, data):
+        return self._pipe(['-d', '-c', '-q'], data)
+
+
+class SevenZipBinaryCodec(Codec):
+    """7z archives need a seekable file, so this is the one backend that still uses a temp dir."""
+    family, tag = 'lzma', '7Z_F'
+    in_process = False
+
+    def __init__(self, exe):
+        self.exe = exe
+
+    def tag_for(self, level):
+        return '7Z_I' if level >= 5 else '7Z_F'
+
+    def compress(self, data, level):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_tmp = os.path.join(tmp_dir, "output.compressed")
+            try:
+                process = subprocess.Popen(
+                    [self.exe, 'a', f'-mx{level}', '-si', output_tmp],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    creationflags=NO_WINDOW
+                )
+                process.communicate(input=data)
+                if process.returncode == 0 and os.path.exists(output_tmp):
+                    with open(output_tmp, "rb") as f:
+                        return f.read()
+            except Exception:
+                pass
+        return None
+
+    def decompress(self, data):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_tmp = os.path.join(tmp_dir, "comp.bin")
+            with open(input_tmp, "wb") as f:
+                f.write(data)
+            result = subprocess.run([self.exe, 'e', input_tmp, '-so', '-y'], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, creationflags=NO_WINDOW)
+            if result.returncode != 0:
+                raise RuntimeError("7za could not extract block")
+            return result.stdout
+
+
+class CodecRegistry:
+    """
+    Resolves codec families (for compression) and manifest tags (for decompression)
+    against the chosen backend:
+      - "library":    in-process stdlib lzma/zlib/bz2 (+ zstandard, and trained
+                      zstd dictionaries, when importable)
+      - "subprocess": bundled / PATH binaries only (legacy behaviour)
+      - "auto":       library first, binaries to fill the gaps (e.g. zstd without zstandard)
+    """
+
+    BACKENDS = ("auto", "library", "subprocess")
+
+    def __init__(self, bin_dir, backend="auto"):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown codec backend: {backend}")
+        self.bin_dir = bin_dir
+        self.backend = backend
+
+        zstd_exe = find_binary(bin_dir, 'zstd')
+        sevenzip_exe = find_binary(bin_dir, '7za', '7z')
+
+        library = {'lzma': LzmaCodec(), 'zlib': ZlibCodec(), 'bz2': Bz2Codec()}
+        if zstandard is not None:
+            library['zstd'] = ZstdLibCodec()
+            library['zstd_dict'] = ZstdDictCodec()
+
+        binaries = {}
+        if zstd_exe:
+            binaries['zstd'] = ZstdBinaryCodec(zstd_exe)
+        if sevenzip_exe:
+            binaries['lzma'] = SevenZipBinaryCodec(sevenzip_exe)
+
+        if backend == "library":
+            self.families = library
+        elif backend == "subprocess":
+            self.families = binaries
+        else:
+            self.families = dict(binaries)
+            self.families.update(library)
+
+        # Decoders are resolved regardless of backend so any archive stays readable
+        self.decoders = {c.tag: c for c in (LzmaCodec(), ZlibCodec(), Bz2Codec())}
+        if 'zstd' in library:
+            self.decoders['ZSTD_T'] = library['zstd']
+        elif 'zstd' in binaries:
+            self.decoders['ZSTD_T'] = binaries['zstd']
+        if 'lzma' in binaries:
+            self.decoders['7Z_I'] = self.decoders['7Z_F'] = binaries['lzma']
+        if zstandard is not None:
+            self.decoders['ZSTD_D'] = library['zstd_dict']
+
+    def get(self, family):
+        return self.families.get(family)
+
+    def compress(self, family, data, level, dictionary=None):
+        """Returns (compressed, tag) or (None, None) if the family is unavailable or failed."""
+        codec = self.families.get(family)
+        if codec is None:
+            return None, None
+        try:
+            out = codec.compress(data, level) if dictionary is None else codec.compress(data, level, dictionary)
+        except Exception:
+            return None, None
+        if out is None:
+            return None, None
+        return out, codec.tag_for(level)
+
+    def decompress(self, data, algo, dictionary=None):
+        if algo == "STORE":
+            return data
+        codec = self.decoders.get(algo)
+        if codec is None:
+            raise ValueError(f"No decoder available for block algorithm '{algo}'")
+        if dictionary is not None:
+            return codec.decompress(data, dictionary)
+        return codec.decompress(data)
+
+    def train_dictionary(self, samples, dict_size):
+        """Trains a zstd dictionary from sample buffers; None if unsupported or training failed."""
+        codec = self.families.get('zstd_dict')
+        if codec is None:
+            return None
+        try:
+            return codec.train(samples, dict_size)
+        except Exception:
+            return None
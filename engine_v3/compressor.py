@@ -1,102 +1,163 @@
-import subprocess
-import os
-import tempfile
 import time
+from .codecs import CodecRegistry
 
 class MultiStreamCompressor:
-    """Bridges SuperBlocks to offline binaries (zstd, 7za)."""
-    
-    def __init__(self, bin_dir):
+    """Bridges SuperBlocks to the codec layer (in-process libraries or offline binaries)."""
+
+    # Label -> ordered (family, level) preferences; the first codec that succeeds wins.
+    # Levels mirror the original binary calls: zstd -19, 7z -mx9 (LZMA2), 7z -mx1.
+    LABEL_CHAINS = {
+        'TEXT': [('zstd', 19), ('lzma', 9)],
+        'IMAGE': [('lzma', 9)],
+    }
+    FALLBACK_CHAIN = [('lzma', 1), ('zlib', 6)]
+
+    # Label -> zstd level for dictionary compression. Blocks up to DICT_MAX_BLOCK bytes
+    # compress poorly on their own; a dictionary trained on their siblings primes the
+    # window with the shared keys / boilerplate they all repeat.
+    DICT_LABELS = {'TEXT': 19}
+    DICT_MAX_BLOCK = 1024 * 1024
+    DICT_SIZE = 112 * 1024      # upper bound; scaled down to ~1/64 of the sampled bytes
+    DICT_SAMPLE_SIZE = 16 * 1024
+    DICT_PROBE_LEVEL = 3        # fast level used to check that a dictionary pays for its own bytes
+
+    # Trial selection: every candidate compresses a small sample of the block and the
+    # one with the best compression gain net of its CPU cost is used for the full block.
+    TRIAL_CANDIDATES = [('zstd', 3), ('zstd', 19), ('lzma', 6), ('lzma', 9), ('bz2', 9), ('zlib', 6)]
+    TRIAL_PROBES = [('zstd', 1), ('zlib', 1)]   # fastest available one runs first
+    TRIAL_SAMPLE_SIZE = 64 * 1024               # taken as 4 slices spread over the block
+    TRIAL_STORE_RATIO = 0.98                    # probe ratio at or above this -> STORE
+    # Ratio points one CPU-second per MB is worth giving up, mirroring selector.score_algo's priorities
+    TRIAL_CPU_PRICE = {'size': 0.02, 'balanced': 0.1, 'speed': 0.5}
+
+    SELECTIONS = ("label", "trial")
+
+    def __init__(self, bin_dir, backend="auto", selection="label", priority="balanced"):
+        """
+        selection: "label" (fixed codec chain per label) or "trial" (sample-based choice per block).
+        priority: "size" | "balanced" | "speed", how much CPU time the trial mode may trade for ratio.
+        """
+        if selection not in self.SELECTIONS:
+            raise ValueError(f"Unknown codec selection mode: {selection}")
         self.bin_dir = bin_dir
-        self.bins = {
-            'zstd': os.path.join(bin_dir, 'zstd.exe'),
-            '7zip': os.path.join(bin_dir, '7za.exe'),
-        }
-
-    def _run_binary(self, cmd):
-        try:
-            # 0x08000000 = CREATE_NO_WINDOW
-            result = subprocess.run(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                creationflags=0x08000000,
-                timeout=30
-            )
-            return result.returncode == 0, result.stdout
-        except:
-            return False, b""
-
-    def compress_block(self, block):
+        self.codecs = CodecRegistry(bin_dir, backend)
+        self.selection = selection
+        self.cpu_price = self.TRIAL_CPU_PRICE.get(priority, self.TRIAL_CPU_PRICE['balanced'])
+
+    def wants_dictionary(self, block):
+        return block['label'] in self.DICT_LABELS and block['size'] <= self.DICT_MAX_BLOCK
+
+    def dictionary_samples(self, block):
+        """Cuts a block into trainer-sized samples along its chunk (file) boundaries."""
+        data = memoryview(block['data'])
+        sizes = [size for _, size in block.get('chunks') or [[None, len(data)]]]
+        samples, offset = [], 0
+        for size in sizes:
+            for start in range(offset, offset + size, self.DICT_SAMPLE_SIZE):
+                samples.append(bytes(data[start:min(start + self.DICT_SAMPLE_SIZE, offset + size)]))
+            offset += size
+        return samples
+
+    def train_dictionary(self, blocks):
+        """
+        Trains a dictionary from sample blocks of one label. Returns None unless the
+        dictionary saves more on those blocks than it costs to store in the container.
+        """
+        samples = [sample for block in blocks for sample in self.dictionary_samples(block)]
+        sampled = sum(len(sample) for sample in samples)
+        dictionary = self.codecs.train_dictionary(samples, max(4096, min(self.DICT_SIZE, sampled // 64)))
+        if dictionary is None:
+            return None
+
+        saved = 0
+        for block in blocks:
+            plain, _ = self.codecs.compress('zstd', block['data'], self.DICT_PROBE_LEVEL)
+            primed, _ = self.codecs.compress('zstd_dict', block['data'], self.DICT_PROBE_LEVEL, dictionary)
+            if plain is None or primed is None:
+                return None
+            saved += len(plain) - len(primed)
+        return dictionary if saved > len(dictionary) else None
+
+    def compress_block(self, block, dictionaries=None):
         """
         Compresses a single block using the best tool.
+        dictionaries: label -> trained zstd dictionary, used for small blocks of that label.
         Returns (compressed_data, algorithm_used).
         """
         label = block['label']
         data = block['data']
-        
-        # Temp files for binary interaction
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            input_tmp = os.path.join(tmp_dir, "input.raw")
-            output_tmp = os.path.join(tmp_dir, "output.compressed")
-            
-            with open(input_tmp, "wb") as f:
-                f.write(data)
-
-            success = False
-            compressed_data = None
-            algo = "STORE"
-
-            if label == 'TEXT' and os.path.exists(self.bins['zstd']):
-                # Text -> Zstd High
-                cmd = [self.bins['zstd'], '-19', '-f', input_tmp, '-o', output_tmp]
-                ok, _ = self._run_binary(cmd)
-                if ok and os.path.exists(output_tmp):
-                    success, algo = True, "ZSTD_T"
-            
-            elif label == 'IMAGE' and os.path.exists(self.bins['7zip']):
-                # Image -> 7z LZMA2
-                # 'a' is add, '-mx9' is ultra, '-si' is stdin but we use files for reliability
-                cmd = [self.bins['7zip'], 'a', '-mx9', '-si', output_tmp]
-                # Piping manually since 7za 'a' with -si reads stdin
-                try:
-                    process = subprocess.Popen(
-                        [self.bins['7zip'], 'a', '-mx9', '-si', output_tmp],
-                        stdin=subprocess.PIPE,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        creationflags=0x08000000
-                    )
-                    process.communicate(input=data)
-                    if process.returncode == 0 and os.path.exists(output_tmp):
-                        success, algo = True, "7Z_I"
-                except:
-                    pass
-
-            # Fallback for BINARY or failed compression
-            if not success and os.path.exists(self.bins['7zip']):
-                # Fast packing
-                try:
-                    process = subprocess.Popen(
-                        [self.bins['7zip'], 'a', '-mx1', '-si', output_tmp],
-                        stdin=subprocess.PIPE,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        creationflags=0x08000000
-                    )
-                    process.communicate(input=data)
-                    if process.returncode == 0 and os.path.exists(output_tmp):
-                        success, algo = True, "7Z_F"
-                except:
-                    pass
-
-            if success:
-                with open(output_tmp, "rb") as f:
-                    compressed_data = f.read()
-                
-                # Check if compression actually made it smaller
+
+        dictionary = (dictionaries or {}).get(label)
+        if dictionary is not None and self.wants_dictionary(block):
+            compressed_data, algo = self.codecs.compress('zstd_dict', data, self.DICT_LABELS[label], dictionary)
+            if compressed_data is not None:
                 if len(compressed_data) >= len(data):
                     return data, "STORE"
                 return compressed_data, algo
-            
+
+        if self.selection == "trial":
+            return self._compress_trial(data)
+
+        chain = self.LABEL_CHAINS.get(label, []) + self.FALLBACK_CHAIN
+        for family, level in chain:
+            compressed_data, algo = self.codecs.compress(family, data, level)
+            if compressed_data is None:
+                continue
+
+            # Check if compression actually made it smaller
+            if len(compressed_data) >= len(data):
+                return data, "STORE"
+            return compressed_data, algo
+
+        return data, "STORE"
+
+    def trial_sample(self, data):
+        """The whole block if it is small, else 4 evenly spaced slices (head, middle, tail)."""
+        if len(data) <= self.TRIAL_SAMPLE_SIZE:
+            return data
+        view = memoryview(data)
+        piece = self.TRIAL_SAMPLE_SIZE // 4
+        step = (len(data) - piece) // 3
+        return b''.join(view[i * step:i * step + piece] for i in range(4))
+
+    def _timed(self, family, data, level):
+        """(compressed, tag, seconds); CPU time for in-process codecs, wall time for binaries."""
+        codec = self.codecs.get(family)
+        clock = time.thread_time if codec is not None and codec.in_process else time.perf_counter
+        start = clock()
+        out, tag = self.codecs.compress(family, data, level)
+        return out, tag, clock() - start
+
+    def _compress_trial(self, data):
+        sample = self.trial_sample(data)
+        whole = len(sample) == len(data)
+
+        # Incompressible (already compressed / encrypted): one cheap probe decides
+        for family, level in self.TRIAL_PROBES:
+            out, _, _ = self._timed(family, sample, level)
+            if out is not None:
+                if len(out) >= len(sample) * self.TRIAL_STORE_RATIO:
+                    return data, "STORE"
+                break
+
+        best = None
+        mb = len(sample) / (1024 * 1024)
+        for family, level in self.TRIAL_CANDIDATES:
+            out, tag, seconds = self._timed(family, sample, level)
+            if out is None:
+                continue
+            score = (1 - len(out) / len(sample)) - self.cpu_price * seconds / mb
+            if best is None or score > best[0]:
+                best = (score, family, level, out, tag)
+
+        if best is None:
+            return data, "STORE"
+        _, family, level, compressed_data, algo = best
+        if not whole:
+            compressed_data, algo = self.codecs.compress(family, data, level)
+        if compressed_data is None or len(compressed_data) >= len(data):
             return data, "STORE"
+        return compressed_data, algo
+
+    def decompress_block(self, data, algo, dictionary=None):
+        return self.codecs.decompress(data, algo, dictionary)
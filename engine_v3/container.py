@@ -1,13 +1,24 @@
 import json
 import struct
 import os
+import zlib
+from .manifest import (BinaryManifest, JsonManifest, ManifestWriter, MANIFEST_MAGIC,
+                       FOOTER, FOOTER_SIGNATURE, LEGACY_SIGNATURE)
 
 class AdaptiveContainer:
     """Handles the V3 binary format with Dual Manifests."""
     
-    def __init__(self, output_path):
+    def __init__(self, output_path, manifest_format="binary"):
+        """
+        manifest_format: "binary" (v2, indexed) or "json" (v1 JSON layout; a plain list
+        only when there is no meta, and entries may use algo tags older readers lack).
+        """
+        if manifest_format not in ("binary", "json"):
+            raise ValueError(f"Unknown manifest format: {manifest_format}")
         self.output_path = output_path
-        self.blocks = []
+        self.manifest_format = manifest_format
+        self.manifest = ManifestWriter()
+        self.blocks = [] # Entry dicts, only kept for the JSON format
         self.current_offset = 0
 
     def _align_to_4kb(self, f):
@@ -16,57 +27,110 @@ class AdaptiveContainer:
             f.write(b'\x00' * padding)
         return f.tell()
 
-    def write_package(self, block_stream):
-        """Streams blocks into the final binary file."""
+    def write_package(self, block_stream, meta=None, dictionaries=None):
+        """
+        Streams blocks into the final binary file.
+        meta: archive-wide tables (e.g. the directory file table) stored with the manifest;
+        it is serialized only after the stream is exhausted, so producers may fill it while streaming.
+        dictionaries: label -> codec dictionary, written once after the blocks and
+        located through meta['dicts'] (label -> [start, end]); filled while streaming, like meta.
+        """
         with open(self.output_path, 'wb') as f:
             # 1. Header: Signature(7) + ManifestOffset(8)
             f.write(b'ADAPTV3')
             f.write(struct.pack('<Q', 0)) # Placeholder for Manifest Offset
             self.current_offset = 15
 
+            refs = 0
             for block in block_stream:
+                if block['algo'] == 'REF':
+                    # Deduplicated: no bytes written, the span points at the first copy
+                    start_off, end_off = self.manifest.span(block['ref'])
+                    self._add_entry({
+                        'id': len(self.manifest),
+                        'type': block['label'],
+                        'algo': 'REF',
+                        'start': start_off,
+                        'end': end_off,
+                        'checksum': block['checksum'],
+                        'orig_size': block['orig_size'],
+                        'ref': block['ref'],
+                        'ref_offset': block['ref_offset'],
+                        'hash': block['hash']
+                    })
+                    refs += 1
+                    continue
+
                 self.current_offset = self._align_to_4kb(f)
                 
                 start_off = self.current_offset
                 f.write(block['data'])
                 end_off = f.tell()
                 
-                self.blocks.append({
-                    'id': len(self.blocks),
+                self._add_entry({
+                    'id': len(self.manifest),
                     'type': block['label'],
                     'algo': block['algo'],
                     'start': start_off,
                     'end': end_off,
                     'checksum': block['checksum'],
-                    'orig_size': block['orig_size']
+                    'orig_size': block['orig_size'],
+                    'chunks': block.get('chunks', [])
                 })
                 self.current_offset = end_off
 
+            if dictionaries:
+                meta = dict(meta or {})
+                meta['dicts'] = {}
+                for label, dictionary in dictionaries.items():
+                    start_off = self._align_to_4kb(f)
+                    f.write(dictionary)
+                    meta['dicts'][label] = [start_off, f.tell()]
+
             # 2. Write Manifest (Tail)
-            manifest_json = json.dumps(self.blocks).encode('utf-8')
-            manifest_size = len(manifest_json)
-            
             manifest_start = f.tell()
-            f.write(manifest_json)
-            f.write(struct.pack('<Q', manifest_size)) # 8 bytes size
-            f.write(b'ADAPTV3') # Signature
+            if self.manifest_format == "json":
+                # Plain list for single files (v1 layout); wrapped only when meta is present
+                document = {'blocks': self.blocks, 'meta': meta} if meta else self.blocks
+                manifest_json = json.dumps(document).encode('utf-8')
+                f.write(manifest_json)
+                f.write(struct.pack('<Q', len(manifest_json))) # 8 bytes size
+                f.write(LEGACY_SIGNATURE) # Signature
+            else:
+                manifest_bin = self.manifest.to_bytes(meta)
+                f.write(manifest_bin)
+                f.write(FOOTER.pack(len(manifest_bin), zlib.crc32(manifest_bin) & 0xFFFFFFFF, FOOTER_SIGNATURE))
             
             # 3. Update Header with the real offset
             f.seek(7)
             f.write(struct.pack('<Q', manifest_start))
             
-        print(f"Package created: {self.output_path} ({len(self.blocks)} blocks)")
+        print(f"Package created: {self.output_path} ({len(self.manifest)} blocks, {refs} deduplicated)")
+
+    def _add_entry(self, entry):
+        self.manifest.add(entry)
+        if self.manifest_format == "json":
+            self.blocks.append(entry)
 
     @staticmethod
-    def read_manifest(path):
-        """Reads the manifest from the end of the file (robust to header damage)."""
+    def read_manifest(path, verify=True):
+        """
+        Opens the manifest from the end of the file (robust to header damage).
+        Returns a Manifest: a sequence of block dicts, memory-mapped and indexed
+        for binary (v2) archives, parsed JSON for legacy (v1) archives.
+        """
         file_size = os.path.getsize(path)
         with open(path, 'rb') as f:
             # Check Tail first
-            f.seek(-15, os.SEEK_END)
-            footer = f.read(15)
-            if footer.endswith(b'ADAPTV3'):
-                size = struct.unpack('<Q', footer[:8])[0]
+            f.seek(max(file_size - FOOTER.size, 0))
+            footer = f.read(FOOTER.size)
+            if footer.endswith(FOOTER_SIGNATURE):
+                size = FOOTER.unpack(footer)[0]
+                if size > file_size: raise ValueError("Manifest size exceeds file size.")
+                return BinaryManifest.open(path, file_size - FOOTER.size - size, verify)
+
+            if footer.endswith(LEGACY_SIGNATURE):
+                size = struct.unpack('<Q', footer[-15:-7])[0]
                 if size > file_size: raise ValueError("Manifest size exceeds file size.")
                 f.seek(-(15 + size), os.SEEK_END)
                 manifest_data = f.read(size)
@@ -78,10 +142,15 @@ class AdaptiveContainer:
                 m_off = struct.unpack('<Q', f.read(8))[0]
                 if m_off > file_size: raise ValueError("Manifest offset out of bounds.")
                 f.seek(m_off)
-                # We need to know where the manifest ends if reading from header
-                # For simplicity in this v3, we assume tail is preferred.
-                # If we really want robustness, we'd store manifest size in header too.
-                # Let's just read until the tail footer begins.
+                if f.read(len(MANIFEST_MAGIC)) == MANIFEST_MAGIC:
+                    # Binary manifests are self-sizing, only the footer CRC is lost
+                    return BinaryManifest.open(path, m_off, verify=False)
+                f.seek(m_off)
+                # Legacy JSON manifests are not self-sizing:
+                # read until the tail footer begins.
                 manifest_data = f.read(file_size - m_off - 15)
             
-            return json.loads(manifest_data.decode('utf-8'))
+            document = json.loads(manifest_data.decode('utf-8'))
+            if isinstance(document, dict):
+                return JsonManifest(document['blocks'], document.get('meta'))
+            return JsonManifest(document)
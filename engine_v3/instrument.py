@@ -0,0 +1,187 @@
+"""
+Stage profiler for the V3 pipeline.
+
+    profiler = StageProfiler()
+    engine = AdaptiveEngineV3(bin_dir, profiler=profiler)
+    engine.compress_file(src, dst)
+    print(profiler.to_json())
+
+Stages nest (the aggregator pulls chunks from the slicer, the container pulls
+blocks from the aggregator...), so every stage records its SELF time: time
+spent in nested stages on the same thread is subtracted. Summing the stages
+of the main thread therefore adds up to the run's wall time. 'compress' is
+measured inside the pool workers and sums their per-block time (it can
+exceed the wall time when workers run in parallel). With memory-mapped input
+the page-fault reads land in the first stage that touches the bytes ('hash').
+
+The engine's default is NULL_PROFILER, whose hooks are shared no-op objects,
+so a disabled run costs one attribute lookup and an empty `with` per hook.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+
+
+class _Stage:
+    """Context manager for one timed stage run; add() attaches counts to it."""
+
+    __slots__ = ('profiler', 'name', 'counts', 'codec', 't0', 'c0', 'frame')
+
+    def __init__(self, profiler, name, counts, codec):
+        self.profiler = profiler
+        self.name = name
+        self.counts = counts
+        self.codec = codec
+
+    def add(self, bytes_in=0, bytes_out=0, items=0, codec=None):
+        self.counts[0] += bytes_in
+        self.counts[1] += bytes_out
+        self.counts[2] += items
+        if codec is not None:
+            self.codec = codec
+
+    def __enter__(self):
+        self.frame = [0.0, 0.0] # wall / CPU time of nested stages
+        self.profiler._stack().append(self.frame)
+        self.t0, self.c0 = time.perf_counter(), time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall, cpu = time.perf_counter() - self.t0, time.thread_time() - self.c0
+        stack = self.profiler._stack()
+        stack.pop()
+        if stack:
+            stack[-1][0] += wall
+            stack[-1][1] += cpu
+        self.profiler.record(self.name, wall - self.frame[0], cpu - self.frame[1], *self.counts, codec=self.codec)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def add(self, bytes_in=0, bytes_out=0, items=0, codec=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullProfiler:
+    """Disabled profiler: every hook is a no-op."""
+
+    enabled = False
+
+    def stage(self, name, bytes_in=0, bytes_out=0, items=0, codec=None):
+        return _NULL_STAGE
+
+    def iterate(self, name, iterable, measure=None):
+        return iterable
+
+    def record(self, name, wall, cpu, bytes_in=0, bytes_out=0, items=0, codec=None):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class StageProfiler(NullProfiler):
+    """Thread-safe per-stage totals: calls, self wall/CPU time, bytes in/out, items, codecs."""
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {} # name -> [calls, wall, cpu, bytes_in, bytes_out, items, Counter]
+            self._t0, self._c0 = time.perf_counter(), time.process_time()
+
+    def __reduce__(self):
+        # Process-pool workers get a disabled profiler; their timings travel back via timed()
+        return (NullProfiler, ())
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stage(self, name, bytes_in=0, bytes_out=0, items=0, codec=None):
+        return _Stage(self, name, [bytes_in, bytes_out, items], codec)
+
+    def iterate(self, name, iterable, measure=None):
+        """Yields from `iterable`, timing each step as stage `name`; measure(item) -> bytes_out."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as stage:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                stage.add(bytes_out=measure(item) if measure else 0, items=1)
+            yield item
+
+    def record(self, name, wall, cpu, bytes_in=0, bytes_out=0, items=0, codec=None):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = [0, 0.0, 0.0, 0, 0, 0, Counter()]
+            stats[0] += 1
+            stats[1] += wall
+            stats[2] += cpu
+            stats[3] += bytes_in
+            stats[4] += bytes_out
+            stats[5] += items
+            if codec is not None:
+                stats[6][codec] += 1
+
+    def report(self):
+        """Structured snapshot: run totals plus one dict per stage (in first-seen order)."""
+        with self._lock:
+            wall = time.perf_counter() - self._t0
+            stages = {}
+            for name, (calls, stage_wall, cpu, bytes_in, bytes_out, items, codecs) in self._stats.items():
+                stages[name] = {
+                    'calls': calls,
+                    'wall_s': round(stage_wall, 6),
+                    'cpu_s': round(cpu, 6),
+                    'wall_share': round(stage_wall / wall, 4) if wall else 0.0,
+                    'bytes_in': bytes_in,
+                    'bytes_out': bytes_out,
+                    'items': items,
+                    'mbps': round(max(bytes_in, bytes_out) / 1048576 / stage_wall, 2) if stage_wall else None,
+                }
+                if codecs:
+                    stages[name]['codecs'] = dict(codecs)
+            return {
+                'wall_s': round(wall, 6),
+                'cpu_s': round(time.process_time() - self._c0, 6),
+                'stages': stages,
+            }
+
+    def to_json(self, path=None, indent=2):
+        """The report as JSON text; also written to `path` when given."""
+        text = json.dumps(self.report(), indent=indent)
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        return text
+
+
+def timed(fn, item):
+    """Pool task wrapper: (fn(item), wall seconds, CPU seconds of the worker thread)."""
+    t0, c0 = time.perf_counter(), time.thread_time()
+    result = fn(item)
+    return result, time.perf_counter() - t0, time.thread_time() - c0
@@ -0,0 +1,97 @@
+import math
+import hashlib
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # Optional: pure-Python fallback keeps the pipeline importable
+    np = None
+
+# Bytes treated as text: printable ASCII plus TAB, LF, CR
+PRINTABLE_BYTES = bytes(range(32, 127)) + b'\t\n\r'
+
+if np is not None:
+    _PRINTABLE_MASK = np.zeros(256, dtype=bool)
+    _PRINTABLE_MASK[list(PRINTABLE_BYTES)] = True
+
+
+def byte_histogram(data):
+    """256-bin byte histogram of any buffer (bytes, bytearray, memoryview, mmap slice)."""
+    if np is not None:
+        return np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    counts = Counter(bytes(data))
+    return [counts.get(b, 0) for b in range(256)]
+
+
+def byte_stats(data):
+    """
+    Single-pass byte statistics shared by analyzer.sample_features and
+    HeuristicClassifier.classify: one histogram feeds entropy, printable ratio
+    and null count instead of three separate Python loops over the sample.
+    """
+    size = len(data)
+    if not size:
+        return {'size': 0, 'entropy': 0, 'printable_ratio': 0, 'null_count': 0}
+
+    hist = byte_histogram(data)
+
+    if np is not None:
+        p = hist[hist > 0] / size
+        entropy = float(-(p * np.log2(p)).sum())
+        printable = int(hist[_PRINTABLE_MASK].sum())
+    else:
+        entropy = 0
+        for count in hist:
+            if count:
+                p_x = count / size
+                entropy -= p_x * math.log2(p_x)
+        printable = sum(hist[b] for b in PRINTABLE_BYTES)
+
+    return {
+        'size': size,
+        'entropy': entropy,
+        'printable_ratio': printable / size,
+        'null_count': int(hist[0]),
+    }
+
+
+def shannon_entropy(data):
+    """Shannon Entropy in bits per byte (0.0 to 8.0)."""
+    return byte_stats(data)['entropy']
+
+
+# --- Gear rolling hash (FastCDC) ---
+
+# 256 pseudo-random 64-bit values; derived from blake2b so cut points are stable across runs/machines
+GEAR = tuple(int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), 'little') for i in range(256))
+GEAR_WINDOW = 64
+_MASK64 = (1 << 64) - 1
+
+if np is not None:
+    _GEAR_ARRAY = np.array(GEAR, dtype=np.uint64)
+
+
+def gear_candidates(data, base, masks):
+    """
+    Positions (base + i) whose gear hash h[i] satisfies h & mask == 0, one sorted list per mask.
+
+    h[i] = sum(GEAR[data[i-k]] << k for k < 64), i.e. the FastCDC hash over the
+    trailing 64-byte window. With NumPy it is built in log2(64) = 6 vectorised
+    doubling steps instead of a per-byte Python loop.
+    """
+    if np is not None:
+        h = _GEAR_ARRAY[np.frombuffer(data, dtype=np.uint8)]
+        span = 1
+        while span < GEAR_WINDOW:
+            h[span:] += h[:-span] << np.uint64(span)  # RHS is materialised first, so no aliasing
+            span *= 2
+        return [(np.flatnonzero((h & np.uint64(mask)) == 0) + base).tolist() for mask in masks]
+
+    found = [[] for _ in masks]
+    h = 0
+    for i, b in enumerate(bytes(data)):
+        h = ((h << 1) + GEAR[b]) & _MASK64
+        for hits, mask in zip(found, masks):
+            if not h & mask:
+                hits.append(base + i)
+    return found
@@ -0,0 +1,269 @@
+"""
+Binary manifest (format v2) layout, written at the tail of a .adaptive file:
+
+    HEADER   magic 'AMF2', version, record size, block count, chunk count,
+             string table size, meta size                       (32 bytes)
+    STRINGS  '\\n'-joined label / algo names, referenced by index
+    META     JSON object for small archive-wide tables (may be '{}')
+    (zero padding to an 8-byte boundary)
+    BLOCKS   block count x fixed-width BLOCK_RECORD
+    CHUNKS   chunk count x CHUNK_RECORD (raw content hash + size)
+    FOOTER   manifest size, CRC32 of everything above, 'ADAPTMF'  (19 bytes)
+
+Fixed-width records make block N an O(1) struct.unpack_from on a mmap, and
+the out_offset column (position in the restored stream) is sorted, so the
+block covering any byte is an O(log n) bisect. Nothing is parsed up-front.
+"""
+
+import json
+import mmap
+import bisect
+import struct
+import zlib
+
+MANIFEST_MAGIC = b'AMF2'
+MANIFEST_VERSION = 2
+FOOTER_SIGNATURE = b'ADAPTMF'
+LEGACY_SIGNATURE = b'ADAPTV3'
+
+HEADER = struct.Struct('<4sHHQQII')
+# start, end, orig_size, out_offset, ref_offset, first_chunk, checksum, ref, n_chunks, label, algo, flags
+BLOCK_RECORD = struct.Struct('<QQQQQQIIIBBH')
+CHUNK_RECORD = struct.Struct('<32sQ')
+FOOTER = struct.Struct('<QI7s')
+
+NO_REF = 0xFFFFFFFF
+
+
+class Manifest:
+    """
+    Read-only, sequence-like view of an archive's blocks. Entries are dicts with
+    the same keys for JSON and binary manifests (plus 'out_offset', the block's
+    position in the restored stream).
+    """
+    meta = {}
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def _entry(self, index):
+        raise NotImplementedError
+
+    def _out_offset(self, index):
+        raise NotImplementedError
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("block index out of range")
+        return self._entry(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._entry(index)
+
+    @property
+    def total_size(self):
+        """Size of the restored stream."""
+        if not len(self):
+            return 0
+        last = self._entry(len(self) - 1)
+        return last['out_offset'] + last['orig_size']
+
+    def find(self, offset):
+        """Index of the block holding byte `offset` of the restored stream (O(log n))."""
+        if not 0 <= offset < self.total_size:
+            raise IndexError("offset outside the archived stream")
+        return bisect.bisect_right(_OffsetColumn(self), offset) - 1
+
+    def block_range(self, offset, length):
+        """range() of block indices overlapping [offset, offset + length)."""
+        end = min(offset + length, self.total_size)
+        if length <= 0 or offset >= end:
+            return range(0)
+        return range(self.find(offset), self.find(end - 1) + 1)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _OffsetColumn:
+    """Lazy out_offset column so bisect never materialises the manifest."""
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+
+    def __len__(self):
+        return len(self.manifest)
+
+    def __getitem__(self, index):
+        return self.manifest._out_offset(index)
+
+
+class JsonManifest(Manifest):
+    """Legacy (format v1) JSON list manifest, fully parsed in memory."""
+
+    def __init__(self, entries, meta=None):
+        self.entries = entries
+        self.meta = meta or {}
+        total = 0
+        for entry in entries:
+            entry.setdefault('out_offset', total)
+            total += entry['orig_size']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _entry(self, index):
+        return self.entries[index]
+
+    def _out_offset(self, index):
+        return self.entries[index]['out_offset']
+
+
+class BinaryManifest(Manifest):
+    """Format v2 manifest read in place from a memory-mapped archive."""
+
+    def __init__(self, buf, base, verify=True):
+        self.buf = buf
+        magic, version, record_size, self.count, self.chunk_count, strings_size, meta_size = \
+            HEADER.unpack_from(buf, base)
+        if magic != MANIFEST_MAGIC:
+            raise ValueError("Invalid manifest signature.")
+        if version > MANIFEST_VERSION or record_size != BLOCK_RECORD.size:
+            raise ValueError(f"Unsupported manifest version {version}.")
+
+        pos = base + HEADER.size
+        self.names = bytes(buf[pos:pos + strings_size]).decode('utf-8').split('\n')
+        pos += strings_size
+        self.meta = json.loads(bytes(buf[pos:pos + meta_size]).decode('utf-8') or '{}')
+        pos += meta_size
+        pos += (-(pos - base)) % 8
+        self.records_off = pos
+        self.chunks_off = pos + self.count * BLOCK_RECORD.size
+        self.size = self.chunks_off + self.chunk_count * CHUNK_RECORD.size - base
+        if base + self.size + FOOTER.size > len(buf):
+            raise ValueError("Manifest extends past the end of the archive.")
+
+        if verify:
+            footer_size, crc, _ = FOOTER.unpack_from(buf, base + self.size)
+            if footer_size != self.size or zlib.crc32(buf[base:base + self.size]) & 0xFFFFFFFF != crc:
+                raise ValueError("Manifest CRC mismatch: archive index is damaged.")
+
+    @classmethod
+    def open(cls, path, offset=None, verify=True):
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if offset is None:
+                size = FOOTER.unpack_from(mapped, len(mapped) - FOOTER.size)[0]
+                offset = len(mapped) - FOOTER.size - size
+            manifest = cls(mapped, offset, verify)
+        except Exception:
+            mapped.close()
+            raise
+        manifest.mapped = mapped
+        return manifest
+
+    def close(self):
+        mapped = getattr(self, 'mapped', None)
+        if mapped is not None:
+            mapped.close()
+            self.mapped = None
+
+    def __len__(self):
+        return self.count
+
+    def _out_offset(self, index):
+        return struct.unpack_from('<Q', self.buf, self.records_off + index * BLOCK_RECORD.size + 24)[0]
+
+    def _chunk(self, index):
+        digest, size = CHUNK_RECORD.unpack_from(self.buf, self.chunks_off + index * CHUNK_RECORD.size)
+        return [digest.hex(), size]
+
+    def _entry(self, index):
+        (start, end, orig_size, out_offset, ref_offset, first_chunk, checksum, ref, n_chunks,
+         label, algo, _flags) = BLOCK_RECORD.unpack_from(self.buf, self.records_off + index * BLOCK_RECORD.size)
+        entry = {
+            'id': index,
+            'type': self.names[label],
+            'algo': self.names[algo],
+            'start': start,
+            'end': end,
+            'checksum': checksum,
+            'orig_size': orig_size,
+            'out_offset': out_offset,
+        }
+        chunks = [self._chunk(first_chunk + i) for i in range(n_chunks)]
+        if ref != NO_REF:
+            entry['ref'] = ref
+            entry['ref_offset'] = ref_offset
+            entry['hash'] = chunks[0][0] if chunks else None
+        else:
+            entry['chunks'] = chunks
+        return entry
+
+
+class ManifestWriter:
+    """Accumulates packed block/chunk records while the container streams blocks out."""
+
+    def __init__(self):
+        self.records = bytearray()
+        self.chunks = bytearray()
+        self.count = 0
+        self.chunk_count = 0
+        self.out_offset = 0
+        self.names = []
+        self._name_index = {}
+
+    def __len__(self):
+        return self.count
+
+    def _name(self, name):
+        if name not in self._name_index:
+            if len(self.names) >= 256:
+                raise ValueError("Too many distinct label/algo names for the manifest string table.")
+            self._name_index[name] = len(self.names)
+            self.names.append(name)
+        return self._name_index[name]
+
+    def span(self, index):
+        """(start, end) of an already written block (used to point REF entries at their target)."""
+        start, end = struct.unpack_from('<QQ', self.records, index * BLOCK_RECORD.size)
+        return start, end
+
+    def add(self, entry):
+        """entry: dict with the manifest keys; returns the block id."""
+        chunks = [[entry['hash'], entry['orig_size']]] if 'ref' in entry else entry.get('chunks', [])
+        first_chunk = self.chunk_count
+        for content_hash, size in chunks:
+            self.chunks += CHUNK_RECORD.pack(bytes.fromhex(content_hash), size)
+        self.chunk_count += len(chunks)
+
+        self.records += BLOCK_RECORD.pack(
+            entry['start'], entry['end'], entry['orig_size'], self.out_offset,
+            entry.get('ref_offset', 0), first_chunk, entry['checksum'],
+            entry.get('ref', NO_REF), len(chunks),
+            self._name(entry['type']), self._name(entry['algo']), 0
+        )
+        self.out_offset += entry['orig_size']
+        self.count += 1
+        return self.count - 1
+
+    def to_bytes(self, meta=None):
+        strings = '\n'.join(self.names).encode('utf-8')
+        meta_blob = json.dumps(meta or {}).encode('utf-8')
+        head = HEADER.pack(MANIFEST_MAGIC, MANIFEST_VERSION, BLOCK_RECORD.size, self.count,
+                           self.chunk_count, len(strings), len(meta_blob))
+        body = bytearray(head + strings + meta_blob)
+        body += b'\x00' * ((-len(body)) % 8)
+        body += self.records
+        body += self.chunks
+        return bytes(body)
@@ -0,0 +1,79 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+def default_workers():
+    """Number of workers used when the caller asks for 'auto'."""
+    return max(1, os.cpu_count() or 1)
+
+
+def ordered_map(fn, items, workers=1, window=None, kind="thread"):
+    """
+    Applies fn to every item of a (possibly lazy) iterable using a pool,
+    yielding (item, result) pairs in INPUT order.
+
+    The item is kept on the caller's side, so process workers only ship the
+    result back instead of round-tripping the whole block.
+
+    At most `window` items are in flight at any time, so a 20 GB stream only
+    ever holds `window` blocks in memory regardless of core count.
+    With workers <= 1 this degrades to a plain serial map (no pool at all).
+    """
+    if workers is None or workers == "auto":
+        workers = default_workers()
+
+    if workers <= 1:
+        for item in items:
+            yield item, fn(item)
+        return
+
+    window = max(window or workers * 2, workers)
+    pool_cls = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+
+    with pool_cls(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append((item, pool.submit(fn, item)))
+                # Backpressure: wait for the oldest block before reading more input
+                if len(pending) >= window:
+                    done_item, future = pending.popleft()
+                    yield done_item, future.result()
+
+            while pending:
+                done_item, future = pending.popleft()
+                yield done_item, future.result()
+        finally:
+            # Consumer stopped early or a worker failed: drop what is still queued
+            for _, future in pending:
+                future.cancel()
+
+
+def read_at(path, offset, size):
+    """Positional read that never touches a shared file position (safe across workers)."""
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if hasattr(os, "pread"):
+            return os.pread(fd, size, offset)
+        os.lseek(fd, offset, os.SEEK_SET)
+        return os.read(fd, size)
+    finally:
+        os.close(fd)
+
+
+def write_at(path, data, offset):
+    """Positional write into a pre-sized file (pwrite, or seek+write on a private fd on Windows)."""
+    fd = os.open(path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    try:
+        view = memoryview(data)
+        while view:
+            if hasattr(os, "pwrite"):
+                written = os.pwrite(fd, view, offset)
+            else:
+                os.lseek(fd, offset, os.SEEK_SET)
+                written = os.write(fd, view)
+            view = view[written:]
+            offset += written
+    finally:
+        os.close(fd)
@@ -1,40 +1,36 @@
 import os
-import math
 import re
-from collections import Counter
+import mmap
+import bisect
+from .kernels import byte_stats, gear_candidates, GEAR_WINDOW
+from .instrument import NULL_PROFILER
 
 class HeuristicClassifier:
     """Classifies data chunks using entropy, headers, and statistical sampling."""
     
     @staticmethod
     def shannon_entropy(data):
-        if not data:
-            return 0
-        entropy = 0
-        counts = Counter(data)
-        for count in counts.values():
-            p_x = count / len(data)
-            entropy -= p_x * math.log2(p_x)
-        return entropy
+        return byte_stats(data)['entropy']
 
     @staticmethod
     def classify(chunk):
         # 1. Magic Byte Check (Common Headers)
-        if chunk.startswith(b'\xFF\xD8\xFF'): return 'IMAGE' # JPEG
-        if chunk.startswith(b'\x89PNG\r\n\x1a\n'): return 'IMAGE' # PNG
-        if chunk.startswith(b'%PDF'): return 'IMAGE' # Treating PDF as complex/image stream often better
-        if chunk.startswith(b'BM'): return 'IMAGE' # BMP
+        head = bytes(chunk[:8]) # chunk may be a zero-copy memoryview
+        if head.startswith(b'\xFF\xD8\xFF'): return 'IMAGE' # JPEG
+        if head.startswith(b'\x89PNG\r\n\x1a\n'): return 'IMAGE' # PNG
+        if head.startswith(b'%PDF'): return 'IMAGE' # Treating PDF as complex/image stream often better
+        if head.startswith(b'BM'): return 'IMAGE' # BMP
         
-        # 2. Entropy Check
-        entropy = HeuristicClassifier.shannon_entropy(chunk[:16384]) # Check first 16KB for speed
+        # 2. Entropy Check + printable ratio from the same histogram
+        stats = byte_stats(chunk[:16384]) # Check first 16KB for speed
+        entropy = stats['entropy']
         
         # 3. Text/Regex Sampling
         try:
             # Check if chunk is mostly valid ASCII/printable
-            text_part = chunk[:4096].decode('utf-8', errors='ignore')
-            printable = sum(1 for c in text_part if 32 <= ord(c) <= 126 or ord(c) in [9, 10, 13])
-            if printable / max(len(text_part), 1) > 0.9 and entropy < 5.5:
+            if stats['printable_ratio'] > 0.9 and entropy < 5.5:
                 # Further check with regex for common code/text patterns
+                text_part = bytes(chunk[:4096]).decode('utf-8', errors='ignore')
                 if re.search(r'[a-zA-Z0-9_\-]{4,}', text_part):
                     return 'TEXT'
         except:
@@ -48,21 +44,228 @@ class HeuristicClassifier:
         return 'MIXED_BINARY'
 
 class SlidingWindowSlicer:
-    """Reads a file and yields classified chunks."""
+    """
+    Reads a file and yields classified chunks.
+
+    By default the file is memory-mapped and every chunk's 'data' is a
+    zero-copy memoryview into the mapping, tagged with its file 'offset', so
+    the aggregator can hand whole SuperBlocks to the codecs as a single span.
+    """
     
-    def __init__(self, file_path, chunk_size=1024 * 1024):
+    def __init__(self, file_path, chunk_size=1024 * 1024, use_mmap=True, profiler=NULL_PROFILER):
         self.file_path = file_path
         self.chunk_size = chunk_size
+        self.use_mmap = use_mmap
+        self.profiler = profiler
+
+    def _classify(self, data):
+        with self.profiler.stage("classify", bytes_in=len(data), items=1):
+            return HeuristicClassifier.classify(data)
         
     def stream_chunks(self):
         if not os.path.exists(self.file_path):
             return
-            
+
+        if self.use_mmap and os.path.getsize(self.file_path) > 0:
+            yield from self._stream_mapped()
+        else:
+            yield from self._stream_buffered()
+
+    def _stream_mapped(self):
+        with open(self.file_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+
+        for offset, length in self._boundaries(view):
+            data = view[offset:offset + length]
+            label = self._classify(data)
+            yield {'data': data, 'label': label, 'size': len(data), 'offset': offset}
+
+        view.release()
+        try:
+            mapped.close()
+        except BufferError:
+            # Blocks still in flight (parallel mode) hold views; the map is
+            # unmapped by the GC once the last of them is written out.
+            pass
+
+    def _boundaries(self, view):
+        """Yields (offset, length) cut points over the mapped file: fixed-size windows."""
+        for offset in range(0, len(view), self.chunk_size):
+            yield offset, min(self.chunk_size, len(view) - offset)
+
+    def _stream_buffered(self):
+        offset = 0
         with open(self.file_path, 'rb') as f:
             while True:
                 data = f.read(self.chunk_size)
                 if not data:
                     break
                 
-                label = HeuristicClassifier.classify(data)
-                yield {'data': data, 'label': label, 'size': len(data)}
+                label = self._classify(data)
+                yield {'data': data, 'label': label, 'size': len(data), 'offset': offset}
+                offset += len(data)
+
+class ContentDefinedSlicer(SlidingWindowSlicer):
+    """
+    FastCDC-style slicer: cut points come from a gear rolling hash of the content,
+    so boundaries follow the data instead of fixed 1 MB steps. An inserted byte
+    only moves the cut points around it, and TEXT/BINARY regions are less likely
+    to be split into mislabelled chunks.
+
+    Uses normalized chunking: a stricter mask before avg_size and a looser one
+    after it keeps chunk sizes clustered around avg_size, bounded by min/max.
+    """
+
+    SEGMENT_SIZE = 4 * 1024 * 1024  # Bytes hashed per vectorised pass
+
+    def __init__(self, file_path, min_size=256 * 1024, avg_size=1024 * 1024, max_size=4 * 1024 * 1024,
+                 profiler=NULL_PROFILER):
+        if not 0 < min_size <= avg_size <= max_size:
+            raise ValueError("CDC sizes must satisfy 0 < min_size <= avg_size <= max_size")
+        super().__init__(file_path, chunk_size=avg_size, profiler=profiler)
+        self.min_size = max(min_size, GEAR_WINDOW)
+        self.avg_size = avg_size
+        self.max_size = max_size
+
+        bits = max(avg_size.bit_length() - 1, 2)
+        self.mask_strict = ((1 << (bits + 1)) - 1) << (64 - (bits + 1))
+        self.mask_loose = ((1 << (bits - 1)) - 1) << (64 - (bits - 1))
+
+    def stream_chunks(self):
+        if not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0:
+            return
+        yield from self._stream_mapped()
+
+    def _boundaries(self, view):
+        size = len(view)
+        strict, loose = [], []
+        hashed = 0  # Gear hashes are known for every position < hashed
+        start = 0
+
+        while start < size:
+            limit = min(size, start + self.max_size)
+            while hashed < limit:
+                seg_end = min(size, hashed + self.SEGMENT_SIZE)
+                ctx = max(0, hashed - GEAR_WINDOW + 1)
+                new_strict, new_loose = gear_candidates(view[ctx:seg_end], ctx,
+                                                        (self.mask_strict, self.mask_loose))
+                strict.extend(p for p in new_strict if p >= hashed)
+                loose.extend(p for p in new_loose if p >= hashed)
+                hashed = seg_end
+
+            cut = self._find_cut(start, limit, strict, loose)
+            yield start, cut - start
+            start = cut
+
+            # Forget candidates behind the new chunk start
+            del strict[:bisect.bisect_left(strict, start)]
+            del loose[:bisect.bisect_left(loose, start)]
+
+    def _find_cut(self, start, limit, strict, loose):
+        """A candidate at position p cuts the chunk after byte p (cut = p + 1)."""
+        if limit - start <= self.min_size:
+            return limit
+
+        normal = min(start + self.avg_size, limit)
+        i = bisect.bisect_left(strict, start + self.min_size - 1)
+        if i < len(strict) and strict[i] < normal - 1:
+            return strict[i] + 1
+
+        i = bisect.bisect_left(loose, normal - 1)
+        if i < len(loose) and loose[i] < limit - 1:
+            return loose[i] + 1
+
+        return limit
+
+def unsafe_path_reason(rel_path):
+    """
+    Why a '/'-separated file-table path cannot be restored safely on this OS, or None.
+    ':' is only refused on Windows, where it means a drive or an alternate data stream;
+    elsewhere it is an ordinary filename character.
+    """
+    parts = rel_path.split('/')
+    if rel_path.startswith('/') or any(p in ('', '.', '..') for p in parts):
+        return "absolute path or empty/relative component"
+    if os.name == 'nt' and any(':' in p or '\\' in p for p in parts):
+        return "drive or alternate data stream syntax"
+    return None
+
+class TreeSlicer:
+    """
+    Streams every regular file under a directory as ONE logical stream, so a whole
+    tree lands in a single container.
+
+    Files below `small_file_size` are classified up-front from their head and
+    ordered by label, making small same-label files adjacent: the aggregator then
+    packs them into shared SuperBlocks (dictionary reuse instead of per-file
+    overhead). Larger files follow in path order through the per-file slicer.
+
+    `files` is the resulting file table: path (relative, '/'-separated), mode,
+    mtime, and the file's offset/size inside the logical stream.
+    """
+
+    def __init__(self, root_dir, slicer_factory=SlidingWindowSlicer, small_file_size=1024 * 1024,
+                 profiler=NULL_PROFILER):
+        self.root_dir = root_dir
+        self.slicer_factory = slicer_factory
+        self.small_file_size = small_file_size
+        self.profiler = profiler
+        self.files = []
+
+    def scan(self):
+        small, large = [], []
+        for dir_path, dir_names, file_names in os.walk(self.root_dir):
+            dir_names.sort()
+            for name in sorted(file_names):
+                full_path = os.path.join(dir_path, name)
+                if os.path.islink(full_path) or not os.path.isfile(full_path):
+                    continue
+                st = os.stat(full_path)
+                rel_path = os.path.relpath(full_path, self.root_dir).replace(os.sep, '/')
+                reason = unsafe_path_reason(rel_path)
+                if reason:
+                    raise ValueError(f"Cannot archive {rel_path}: {reason}")
+                entry = {
+                    'path': rel_path,
+                    'mode': st.st_mode & 0o7777,
+                    'mtime': st.st_mtime,
+                    'size': st.st_size,
+                }
+                if st.st_size < self.small_file_size:
+                    with open(full_path, 'rb') as f:
+                        head = f.read(16384)
+                    with self.profiler.stage("classify", bytes_in=len(head), items=1):
+                        entry['label'] = HeuristicClassifier.classify(head) if st.st_size else 'EMPTY'
+                    small.append(entry)
+                else:
+                    large.append(entry)
+
+        small.sort(key=lambda e: (e['label'], e['path']))
+        self.files = small + large
+        return self.files
+
+    def stream_chunks(self):
+        if not self.files:
+            self.scan()
+
+        offset = 0
+        for entry in self.files:
+            full_path = os.path.join(self.root_dir, *entry['path'].split('/'))
+            entry['offset'] = offset
+            written = 0
+            if 'label' in entry:
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+                if data:
+                    yield {'data': data, 'label': entry.pop('label'), 'size': len(data), 'offset': None}
+                else:
+                    entry.pop('label')
+                written = len(data)
+            else:
+                for chunk in self.slicer_factory(full_path).stream_chunks():
+                    written += chunk['size']
+                    yield chunk
+            # The table records what was actually archived, even if the file changed meanwhile
+            entry['size'] = written
+            offset += written
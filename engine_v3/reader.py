@@ -0,0 +1,98 @@
+import io
+import os
+import zlib
+from collections import OrderedDict
+from .container import AdaptiveContainer
+
+class AdaptiveReader(io.RawIOBase):
+    """
+    Seekable, read-only file object over the restored stream of a .adaptive archive.
+
+    Only the blocks overlapping a read are decoded (located through the manifest's
+    offset index), and the last few decoded blocks are kept in a small LRU cache so
+    sequential or clustered random reads don't decode the same block twice.
+    """
+
+    def __init__(self, path, engine, cache_blocks=4):
+        super().__init__()
+        self.path = path
+        self.engine = engine
+        self.cache_blocks = max(1, cache_blocks)
+        # No whole-manifest CRC per open: reads touch a few records and every decoded
+        # block is CRC-checked; verify_file checks the manifest itself
+        self.manifest = AdaptiveContainer.read_manifest(path, verify=False)
+        self.size = self.manifest.total_size
+        self.dictionaries = engine._load_dictionaries(path, self.manifest)
+        self._pos = 0
+        self._cache = OrderedDict() # stored block id -> decoded bytes
+
+    # --- io.RawIOBase interface ---
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer):
+        """Fills `buffer` from the current position, spanning block boundaries as needed."""
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        out = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(out) and self._pos < self.size:
+            index = self.manifest.find(self._pos)
+            entry = self.manifest[index]
+            data = self._block_data(entry)
+            inner = self._pos - entry['out_offset']
+            n = min(len(out) - filled, len(data) - inner)
+            out[filled:filled + n] = data[inner:inner + n]
+            filled += n
+            self._pos += n
+        return filled
+
+    def close(self):
+        if not self.closed:
+            self.manifest.close()
+            self._cache.clear()
+        super().close()
+
+    # --- Block decoding ---
+    def _block_data(self, entry):
+        """Decoded bytes of one manifest entry; REF entries are sliced out of their target."""
+        if entry['algo'] == 'REF':
+            start = entry['ref_offset']
+            return memoryview(self._decoded(self.manifest[entry['ref']]))[start:start + entry['orig_size']]
+        return memoryview(self._decoded(entry))
+
+    def _decoded(self, source):
+        """Decodes (and CRC-checks) a stored block once; later reads hit the LRU cache."""
+        block_id = source['id']
+        if block_id in self._cache:
+            self._cache.move_to_end(block_id)
+            return self._cache[block_id]
+
+        data = self.engine._decode_entry(self.path, source, source, self.dictionaries)
+        if zlib.crc32(data) & 0xFFFFFFFF != source['checksum'] or len(data) != source['orig_size']:
+            raise ValueError(f"Block {block_id} checksum mismatch: archive data is corrupt.")
+
+        self._cache[block_id] = data
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return data
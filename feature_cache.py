@@ -0,0 +1,201 @@
+import os
+import copy
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Anchored to the app, never the cwd; the user cache dir backs read-only installs
+APP_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "feature_cache.db")
+
+def user_cache_path():
+    base = (os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "adaptive-compression", "feature_cache.db")
+
+class FeatureCache:
+    """
+    Two-level cache for analyzer.sample_features results.
+
+    Entries are keyed on (absolute path, sample size) and are only valid while the
+    file's size, mtime_ns and inode still match, so an edited or replaced file is
+    re-analyzed and its row overwritten in place. A bounded in-memory LRU serves
+    repeat lookups in the same session; the SQLite table keeps them across runs
+    and is trimmed (least recently used first) to at most `max_rows`.
+
+    A cache must never break analysis: if no database can be opened (read-only
+    install, unwritable home, locked or corrupt file) or SQLite fails later on,
+    the cache carries on with the in-memory LRU alone.
+    """
+
+    def __init__(self, db_path=None, max_memory=4096, max_rows=100000):
+        """db_path: SQLite file; by default the app's data/ folder, else the user cache dir."""
+        self.max_memory = max(1, max_memory)
+        self.max_rows = max(1, max_rows)
+        self._memory = OrderedDict() # (path, sample_kb) -> (signature, features)
+        self._lock = threading.Lock() # UI preview and pipeline thread share the cache
+        self._touched = [] # pending (last_used, path, sample_kb) updates from disk hits
+        self._conn = None
+        self.db_path = None
+        for candidate in ([db_path] if db_path else [APP_DB_PATH, user_cache_path()]):
+            try:
+                self._open(candidate)
+                break
+            except (OSError, sqlite3.Error):
+                self._disable()
+
+    def _open(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # One long-lived connection: per-lookup connect + fsync'd commits would cost
+        # more than the analysis being cached.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_db()
+        self.db_path = db_path
+
+    def _disable(self):
+        """Falls back to memory only (caller holds the lock or is still in __init__)."""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+        self._conn = None
+        self.db_path = None
+        self._touched = []
+
+    def _init_db(self):
+        with self._lock, self._conn as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS features (
+                    path TEXT,
+                    sample_kb INTEGER,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    inode INTEGER,
+                    features TEXT,
+                    last_used REAL,
+                    PRIMARY KEY (path, sample_kb)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS features_last_used ON features (last_used)")
+            self._rows = conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+            self._trim(conn)
+
+    @staticmethod
+    def signature(st):
+        """Validity fingerprint of an os.stat() result."""
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def get(self, path, sample_kb, st):
+        """Cached features for `path` if it is unchanged since they were stored, else None."""
+        key = (os.path.abspath(path), sample_kb)
+        sig = self.signature(st)
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None and hit[0] == sig:
+                self._memory.move_to_end(key)
+                return copy.deepcopy(hit[1])
+
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns, inode, features FROM features WHERE path = ? AND sample_kb = ?",
+                    key
+                ).fetchone()
+                if row is None or tuple(row[:3]) != sig:
+                    return None
+
+                # Recency updates are batched: a commit per hit would dominate lookup time
+                self._touched.append((time.time(), *key))
+                if len(self._touched) >= 256:
+                    with self._conn as conn:
+                        self._flush(conn)
+            except sqlite3.Error:
+                self._disable()
+                return None
+
+            features = self._decode(row[3])
+            self._remember(key, sig, features)
+            return copy.deepcopy(features)
+
+    def put(self, path, sample_kb, st, features):
+        key = (os.path.abspath(path), sample_kb)
+        sig = self.signature(st)
+        blob = json.dumps(features)
+        with self._lock:
+            self._remember(key, sig, copy.deepcopy(features))
+            if self._conn is None:
+                return
+            try:
+                with self._conn as conn:
+                    updated = conn.execute("""
+                        UPDATE features SET size = ?, mtime_ns = ?, inode = ?, features = ?, last_used = ?
+                        WHERE path = ? AND sample_kb = ?
+                    """, (*sig, blob, time.time(), *key)).rowcount
+                    self._flush(conn)
+                    if not updated:
+                        conn.execute("""
+                            INSERT INTO features (path, sample_kb, size, mtime_ns, inode, features, last_used)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """, (*key, *sig, blob, time.time()))
+                        self._rows += 1
+                        self._trim(conn)
+            except sqlite3.Error:
+                self._disable()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is None:
+                return
+            try:
+                with self._conn as conn:
+                    conn.execute("DELETE FROM features")
+                    self._rows = 0
+            except sqlite3.Error:
+                self._disable()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                with self._conn as conn:
+                    self._flush(conn)
+            except sqlite3.Error:
+                pass
+            self._disable()
+
+    def _remember(self, key, sig, features):
+        self._memory[key] = (sig, features)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _flush(self, conn):
+        if self._touched:
+            conn.executemany("UPDATE features SET last_used = ? WHERE path = ? AND sample_kb = ?", self._touched)
+            self._touched = []
+
+    def _trim(self, conn):
+        """Drops the least recently used rows, down to 90% of max_rows, once the table outgrows it."""
+        if self._rows <= self.max_rows:
+            return
+        target = self.max_rows - self.max_rows // 10
+        conn.execute("""
+            DELETE FROM features WHERE rowid IN
+            (SELECT rowid FROM features ORDER BY last_used ASC LIMIT ?)
+        """, (self._rows - target,))
+        self._rows = target
+
+    @staticmethod
+    def _decode(blob):
+        features = json.loads(blob)
+        visual = features.get('visual')
+        if visual and visual.get('dimensions') is not None:
+            visual['dimensions'] = tuple(visual['dimensions']) # JSON turns PIL's (w, h) into a list
+        return features
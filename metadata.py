@@ -2,11 +2,37 @@ import sqlite3
 import os
 import time
 
+# Anchored to the app, never the cwd; the user data dir backs read-only installs
+APP_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "project_history.db")
+
+def user_data_path():
+    base = (os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_DATA_HOME")
+            or os.path.join(os.path.expanduser("~"), ".local", "share"))
+    return os.path.join(base, "adaptive-compression", "project_history.db")
+
 class CompressionDB:
-    def __init__(self, db_path="data/project_history.db"):
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        self.db_path = db_path
-        self._init_db()
+    def __init__(self, db_path=None, create=True):
+        """
+        db_path: SQLite file; by default the app's data/ folder, else the user data dir.
+        create: False for readers, which open an existing history only and raise
+                FileNotFoundError rather than create an empty database.
+        """
+        candidates = [db_path] if db_path else [APP_DB_PATH, user_data_path()]
+        if not create:
+            existing = [path for path in candidates if os.path.isfile(path)]
+            if not existing:
+                raise FileNotFoundError(f"No history database at {' or '.join(candidates)}")
+            candidates = existing[:1]
+        error = None
+        for candidate in candidates:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(candidate)), exist_ok=True)
+                self.db_path = candidate
+                self._init_db()
+                return
+            except (OSError, sqlite3.Error) as e:
+                error = e
+        raise error
 
     def _init_db(self):
         with sqlite3.connect(self.db_path) as conn:
@@ -24,14 +50,70 @@ class CompressionDB:
                     eco_mode INTEGER
                 )
             """)
+            # Databases created before the learned model lack is_text
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(history)")]
+            if 'is_text' not in columns:
+                conn.execute("ALTER TABLE history ADD COLUMN is_text INTEGER")
+            # Per (engine, feature bucket) running means learned from history
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS engine_model (
+                    engine TEXT,
+                    bucket TEXT,
+                    runs INTEGER,
+                    ratio REAL,
+                    speed_mbps REAL,
+                    PRIMARY KEY (engine, bucket)
+                )
+            """)
 
-    def log_run(self, filename, orig_size, comp_size, entropy, engine, duration, eco_mode):
+    def log_run(self, filename, orig_size, comp_size, entropy, engine, duration, eco_mode, is_text=None):
         ratio = (comp_size / orig_size) if orig_size > 0 else 1.0
         with sqlite3.connect(self.db_path) as conn:
             conn.execute("""
-                INSERT INTO history (filename, original_size, compressed_size, entropy, engine, duration, ratio, eco_mode)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (filename, orig_size, comp_size, entropy, engine, duration, ratio, 1 if eco_mode else 0))
+                INSERT INTO history (filename, original_size, compressed_size, entropy, engine, duration, ratio, eco_mode, is_text)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (filename, orig_size, comp_size, entropy, engine, duration, ratio, 1 if eco_mode else 0,
+                  None if is_text is None else int(bool(is_text))))
+
+    def get_training_runs(self):
+        """(engine, original_size, entropy, is_text, ratio, duration) of every usable run."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute("""
+                SELECT engine, original_size, entropy, is_text, ratio, duration FROM history
+                WHERE original_size > 0 AND duration > 0 ORDER BY id
+            """)
+            return cursor.fetchall()
+
+    def get_model(self):
+        """{(engine, bucket): (runs, ratio, speed_mbps)}"""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute("SELECT engine, bucket, runs, ratio, speed_mbps FROM engine_model")
+            return {(engine, bucket): (runs, ratio, speed) for engine, bucket, runs, ratio, speed in cursor}
+
+    def add_model_run(self, engine, bucket, ratio, speed_mbps):
+        """
+        Folds one run into a model cell as a single upsert (SET expressions see the old
+        row), so concurrent writers, threads or processes, never lose each other's runs.
+        Returns the cell's new (runs, ratio, speed_mbps).
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                INSERT INTO engine_model (engine, bucket, runs, ratio, speed_mbps) VALUES (?, ?, 1, ?, ?)
+                ON CONFLICT (engine, bucket) DO UPDATE SET
+                    runs = runs + 1,
+                    ratio = ratio + (excluded.ratio - ratio) / (runs + 1),
+                    speed_mbps = speed_mbps + (excluded.speed_mbps - speed_mbps) / (runs + 1)
+            """, (engine, bucket, ratio, speed_mbps))
+            return conn.execute("SELECT runs, ratio, speed_mbps FROM engine_model WHERE engine = ? AND bucket = ?",
+                                (engine, bucket)).fetchone()
+
+    def replace_model(self, entries):
+        """Swaps the whole model table for `entries` ({(engine, bucket): (runs, ratio, speed_mbps)})."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM engine_model")
+            conn.executemany("""
+                INSERT INTO engine_model (engine, bucket, runs, ratio, speed_mbps) VALUES (?, ?, ?, ?, ?)
+            """, [(engine, bucket, *stats) for (engine, bucket), stats in entries.items()])
 
     def get_stats(self):
         with sqlite3.connect(self.db_path) as conn:
@@ -0,0 +1,209 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import analyzer
+import runner
+import selector
+from compressor_manager import CompressorManager
+
+# Archive extension per engine (same mapping as the GUI pipeline)
+EXT_MAP = {
+    "zstd": ".adapt",
+    "7zip": ".7z",
+    "paq": ".zpaq",
+    "webp": ".webp",
+    "tar": ".tar",
+    "ffmpeg": ".mp4"
+}
+
+# Rough peak working set (GB) and cores used per engine run; PAQ/zpaq at -m5 is the RAM hog
+ENGINE_RAM_GB = {"paq": 2.5, "7zip": 0.8, "ffmpeg": 1.0, "webp": 0.3, "zstd": 0.2, "tar": 0.05}
+ENGINE_CPU_SLOTS = {"7zip": 2, "ffmpeg": 2}
+
+class ResourceBudget:
+    """
+    Global CPU-slot / RAM budget shared by every job of a pipeline run.
+    A job is admitted only when its slots and RAM fit in what is left of the budget
+    AND the live free RAM (selector.get_system_ram_safety) still covers it plus
+    `headroom_gb`. A job larger than the whole budget runs alone rather than never.
+    """
+
+    def __init__(self, cpu_slots, ram_gb, headroom_gb=1.0, poll=0.5):
+        self.cpu_slots = cpu_slots
+        self.ram_gb = ram_gb
+        self.headroom_gb = headroom_gb
+        self.poll = poll
+        self.used_slots = 0
+        self.used_ram = 0.0
+        self._cond = threading.Condition()
+
+    def _fits(self, slots, ram):
+        if self.used_slots == 0:
+            return True # Never deadlock on a job bigger than the budget
+        if self.used_slots + slots > self.cpu_slots or self.used_ram + ram > self.ram_gb:
+            return False
+        return ram + self.headroom_gb <= selector.get_system_ram_safety()
+
+    def acquire(self, slots, ram):
+        slots = min(slots, self.cpu_slots)
+        with self._cond:
+            # Timed wait: free RAM can also change outside this process
+            while not self._fits(slots, ram):
+                self._cond.wait(self.poll)
+            self.used_slots += slots
+            self.used_ram += ram
+        return slots
+
+    def release(self, slots, ram):
+        with self._cond:
+            self.used_slots -= slots
+            self.used_ram -= ram
+            self._cond.notify_all()
+
+
+class BatchPipeline:
+    """
+    Headless multi-file pipeline: analyze -> select -> compress, many files at once.
+
+    Files are analyzed concurrently, selected in one batch, then compressed
+    largest-first (so the longest jobs start early and the wall-clock tail is
+    short) through a bounded pool gated by a ResourceBudget.
+    """
+
+    def __init__(self, manager=None, workers=None, cpu_slots=None, ram_budget_gb=None,
+                 priority="balanced", max_time=60, headroom_gb=1.0, force_tool=None, verify="sampled"):
+        """
+        force_tool: engine name to use for every file instead of the selector's choice.
+        verify: runner verification policy (see runner.VERIFY_POLICIES).
+        """
+        self.manager = manager or CompressorManager()
+        self.cpu_slots = cpu_slots or os.cpu_count() or 1
+        self.workers = workers or self.cpu_slots
+        # Default budget: most of the RAM that is free right now
+        ram_budget_gb = ram_budget_gb or max(selector.get_system_ram_safety() * 0.8, 0.5)
+        self.budget = ResourceBudget(self.cpu_slots, ram_budget_gb, headroom_gb)
+        self.priority = priority
+        self.max_time = max_time
+        self.force_tool = force_tool
+        self.verify = verify
+
+    @staticmethod
+    def collect(paths):
+        """
+        Expands folders (recursively) into their files. Returns (files, excluded):
+        excluded holds (path, reason) for missing inputs and for outputs this pipeline
+        produced from another input (`<src><ext>` next to `<src>`), which must not be
+        compressed again. Any other .mp4/.7z/... input is a regular file.
+        """
+        files, excluded = [], []
+        for path in paths:
+            if os.path.isdir(path):
+                for dirpath, _, names in os.walk(path):
+                    files.extend(os.path.join(dirpath, name) for name in sorted(names))
+            elif os.path.isfile(path):
+                files.append(path)
+            else:
+                excluded.append((path, "Not found."))
+
+        sources = set(map(os.path.abspath, files))
+        outputs = tuple(set(EXT_MAP.values())) + ('.adaptive',)
+        kept = []
+        for f in files:
+            src = next((f[:-len(ext)] for ext in outputs if f.lower().endswith(ext)), None)
+            if src and os.path.abspath(src) in sources:
+                excluded.append((f, f"Archive of {os.path.basename(src)} from an earlier run."))
+            else:
+                kept.append(f)
+        return kept, excluded
+
+    def analyze(self, files):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(analyzer.sample_features, files))
+
+    def select(self, features):
+        if self.force_tool:
+            return [self.force_tool] * len(features)
+        # Only engines whose binary resolves on this host compete
+        constraints = {'priority': self.priority, 'max_time': self.max_time,
+                       'engines': {tool for tool in EXT_MAP if self.manager.available(tool)}}
+        profile = selector.get_perf_profile()
+        if selector.np is not None:
+            return selector.get_best_tools(selector.features_to_batch(features), constraints, profile)
+        return [selector.get_best_tool(f, constraints, profile) for f in features]
+
+    def run(self, paths, on_result=None):
+        """
+        Compresses every file under `paths`. Returns one result dict per file
+        (runner.run_compressor's keys plus 'path', 'tool' and 'skipped').
+        on_result(result) is called from worker threads as each job finishes.
+        With verify="deferred", run() waits for the background tests before
+        returning and flips failed archives to success False (on_result has
+        already seen them as successes).
+        """
+        files, excluded = self.collect(paths)
+        self._failed_verifications = []
+        features = self.analyze(files)
+        tools = self.select(features)
+
+        jobs = sorted(zip(files, features, tools), key=lambda job: (job[1] or {}).get('size_bytes', 0), reverse=True)
+        results = []
+        lock = threading.Lock()
+
+        def finish(result):
+            with lock:
+                results.append(result)
+            if on_result:
+                on_result(result)
+
+        def work(job, slots, ram):
+            try:
+                finish(self._compress(*job))
+            except Exception as e:
+                finish({"path": job[0], "tool": job[2], "skipped": False, "success": False,
+                        "error": f"Pipeline Error: {str(e)}"})
+            finally:
+                self.budget.release(slots, ram)
+
+        for path, reason in excluded:
+            finish({"path": path, "tool": None, "skipped": True, "success": False, "error": reason})
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for job in jobs:
+                path, stats, tool = job
+                if not stats or tool == "SKIP":
+                    finish({"path": path, "tool": tool, "skipped": True, "success": False,
+                            "error": "Unreadable file." if not stats else "Already compressed."})
+                    continue
+                # Admission happens here, in input order, so largest-first is preserved
+                ram = ENGINE_RAM_GB.get(tool, 0.5)
+                slots = self.budget.acquire(ENGINE_CPU_SLOTS.get(tool, 1), ram)
+                pool.submit(work, job, slots, ram)
+
+        if self.verify == "deferred":
+            runner.get_verify_queue().join()
+            failed = dict(self._failed_verifications)
+            for result in results:
+                if result.get("final_path") in failed:
+                    result.update({"success": False, "error": f"Integrity Fail: {failed[result['final_path']]}"})
+        return results
+
+    def _compress(self, path, stats, tool):
+        output_archive = path + EXT_MAP.get(tool, ".adapt")
+        cmd = self.manager.get_command(tool, path, output_archive, level=self.priority)
+        if cmd is None:
+            return {"path": path, "tool": tool, "skipped": False, "success": False,
+                    "error": f"Engine unavailable: {tool}"}
+        timeout = 3600 if tool == "ffmpeg" else 120
+        result = runner.run_compressor(cmd, path, output_archive, timeout=timeout,
+                                       verify=self.verify, on_verified=self._on_verified)
+        result.update({"path": path, "tool": tool, "skipped": False})
+        if result.get("success"):
+            on_battery, _ = selector.get_battery_status()
+            selector.record_run(stats, engine=tool, comp_size=result['output_size'], duration=result['time'],
+                                eco_mode=on_battery, filename=os.path.basename(path))
+        return result
+
+    def _on_verified(self, archive, ok, message):
+        if not ok:
+            self._failed_verifications.append((archive, message))
@@ -1,20 +1,45 @@
 import subprocess
+import threading
+import itertools
+import queue
 import time
 import os
 
+# Post-run verification policies for run_compressor:
+#   "full"     re-test every archive with the engine's own tester (safest, doubles archive I/O)
+#   "sampled"  re-test one run in VERIFY_SAMPLE_EVERY per engine binary (the first one always)
+#   "deferred" return immediately; the archive is tested on a background VerifyQueue
+#   "none"     trust the engine's exit code
+VERIFY_POLICIES = ("full", "sampled", "deferred", "none")
+VERIFY_SAMPLE_EVERY = 10
+
+# cmd is None when CompressorManager found neither the engine nor a fallback
+ENGINE_UNAVAILABLE_ERROR = "Engine unavailable: binary not found in bin/ or on the PATH."
+ACCESS_DENIED_ERROR = ("Access Denied: Windows Security (Controlled Folder Access) is blocking this folder. "
+                       "Please allow python.exe in Ransomware Protection settings.")
+
+_sample_counters = {} # binary path -> itertools.count
+_writable_dirs = {} # directory -> _dir_signature() when it passed the write probe
+_state_lock = threading.Lock()
+
+def integrity_command(binary_path, archive_path):
+    """The engine's archive test command, or None when the output is not an archive."""
+    ext = os.path.splitext(archive_path)[1].lower()
+    if ext not in ['.7z', '.adapt', '.zpaq', '.paq', '.zst']:
+        return None
+    test_flag = "t" if ("7za" in binary_path.lower() or "zpaq" in binary_path.lower()) else "-t"
+    return [binary_path, test_flag, archive_path]
+
 def verify_integrity(binary_path, archive_path):
     """
     Checks if an ARCHIVE is valid using list-based execution.
     """
     if not os.path.exists(archive_path):
         return (False, "File missing.")
-        
-    ext = os.path.splitext(archive_path)[1].lower()
-    if ext not in ['.7z', '.adapt', '.zpaq', '.paq', '.zst']:
-        return (True, "Skip: Not an archive.")
 
-    test_flag = "t" if ("7za" in binary_path.lower() or "zpaq" in binary_path.lower()) else "-t"
-    test_cmd = [binary_path, test_flag, archive_path]
+    test_cmd = integrity_command(binary_path, archive_path)
+    if test_cmd is None:
+        return (True, "Skip: Not an archive.")
     
     try:
         result = subprocess.run(
@@ -31,11 +56,125 @@ def verify_integrity(binary_path, archive_path):
     except Exception as e:
         return (False, f"Integrity Crash: {str(e)}")
 
-def run_compressor(cmd, input_path, output_path, timeout=120):
+def _dir_signature(path):
+    """Identity and permission bits of a folder; None if it cannot be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    # Not mtime/ctime: every archive written into the folder changes those
+    return (st.st_dev, st.st_ino, st.st_mode, st.st_uid, st.st_gid)
+
+def check_writable(out_dir):
+    """
+    Write-probes a folder (Controlled Folder Access can block writes that os.access allows).
+    Successes are cached per folder until its mode, owner or identity changes (chmod,
+    chown, folder replaced); failures are re-probed so an allowed app recovers.
+    """
+    signature = _dir_signature(out_dir)
+    with _state_lock:
+        if signature is not None and _writable_dirs.get(out_dir) == signature:
+            return True
+        _writable_dirs.pop(out_dir, None)
+    test_file = os.path.join(out_dir, f".perm_test_{os.getpid()}_{threading.get_ident()}")
+    try:
+        with open(test_file, "w") as f: f.write("test")
+        os.remove(test_file)
+    except (PermissionError, OSError):
+        return False
+    with _state_lock:
+        _writable_dirs[out_dir] = signature
+    return True
+
+def clear_output(output_path):
+    """Removes a stale output (file or folder) so the engine starts from a clean slate."""
+    if os.path.exists(output_path):
+        try:
+            import stat
+            if os.path.isdir(output_path):
+                import shutil
+                shutil.rmtree(output_path, ignore_errors=True)
+            else:
+                os.chmod(output_path, stat.S_IWRITE)
+                os.remove(output_path)
+        except: pass
+
+def wait_for_output(output_path, timeout=0.5, step=0.02):
+    """
+    The engine has exited, so its output normally exists already; only a lagging
+    filesystem (Windows AV/indexer) costs a short bounded poll, never a fixed sleep.
+    """
+    deadline = time.time() + timeout
+    while not os.path.exists(output_path):
+        if time.time() >= deadline:
+            return False
+        time.sleep(step)
+    return True
+
+def verify_mode(policy, binary_path):
+    """Resolves 'sampled' to 'full' or 'none' for this run."""
+    if policy not in VERIFY_POLICIES:
+        raise ValueError(f"Unknown verify policy: {policy}")
+    if policy != "sampled":
+        return policy
+    with _state_lock:
+        counter = _sample_counters.setdefault(binary_path, itertools.count())
+        return "full" if next(counter) % VERIFY_SAMPLE_EVERY == 0 else "none"
+
+
+class VerifyQueue:
+    """
+    Background integrity tests for the "deferred" policy. One daemon thread works
+    through archives in submission order; failures are kept in `failures` as
+    (archive_path, message) and passed to each job's callback.
+    """
+
+    def __init__(self):
+        self.failures = []
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="verify-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, binary_path, archive_path, callback=None):
+        """callback(archive_path, ok, message) runs on the verifier thread."""
+        self._jobs.put((binary_path, archive_path, callback))
+
+    def join(self):
+        """Blocks until every submitted archive has been tested."""
+        self._jobs.join()
+
+    def _worker(self):
+        while True:
+            binary_path, archive_path, callback = self._jobs.get()
+            try:
+                ok, msg = verify_integrity(binary_path, archive_path)
+                if not ok:
+                    self.failures.append((archive_path, msg))
+                if callback:
+                    callback(archive_path, ok, msg)
+            except Exception as e:
+                self.failures.append((archive_path, f"Verifier Error: {str(e)}"))
+            finally:
+                self._jobs.task_done()
+
+_verify_queue = None
+
+def get_verify_queue():
+    global _verify_queue
+    with _state_lock:
+        if _verify_queue is None:
+            _verify_queue = VerifyQueue()
+        return _verify_queue
+
+def run_compressor(cmd, input_path, output_path, timeout=120, verify="full", on_verified=None):
     """
     Standardizes command execution and improves diagnostics.
+    verify: one of VERIFY_POLICIES; on_verified(archive, ok, message) is the
+    "deferred" callback. Successful results carry the policy applied in 'verify'.
     """
     start_time = time.time()
+    if not cmd:
+        return {"success": False, "error": ENGINE_UNAVAILABLE_ERROR}
     
     if isinstance(cmd, list):
         binary_path = cmd[0]
@@ -48,25 +187,12 @@ def run_compressor(cmd, input_path, output_path, timeout=120):
         out_dir = os.path.dirname(os.path.abspath(output_path))
         os.makedirs(out_dir, exist_ok=True)
 
-        # 0. PERMISSION CHECK: Verify if we can actually write here
-        test_file = os.path.join(out_dir, f".perm_test_{int(time.time())}")
-        try:
-            with open(test_file, "w") as f: f.write("test")
-            os.remove(test_file)
-        except (PermissionError, OSError):
-            return {"success": False, "error": "Access Denied: Windows Security (Controlled Folder Access) is blocking this folder. Please allow python.exe in Ransomware Protection settings."}
+        # 0. PERMISSION CHECK: Verify if we can actually write here (once per folder)
+        if not check_writable(out_dir):
+            return {"success": False, "error": ACCESS_DENIED_ERROR}
 
         # 1. PRE-CHECK: Allocation Safety
-        if os.path.exists(output_path):
-            try:
-                import stat
-                if os.path.isdir(output_path):
-                    import shutil
-                    shutil.rmtree(output_path, ignore_errors=True)
-                else:
-                    os.chmod(output_path, stat.S_IWRITE)
-                    os.remove(output_path)
-            except: pass
+        clear_output(output_path)
 
         # 2. Execution (Always prefer list-based for safety)
         process = subprocess.run(
@@ -82,20 +208,23 @@ def run_compressor(cmd, input_path, output_path, timeout=120):
         )
         
         # 3. Success Logic
-        if process.returncode == 0:
-            time.sleep(0.5) # Let Windows finalize IO
-            if os.path.exists(output_path):
-                # Verify
+        if process.returncode == 0 and wait_for_output(output_path):
+            # Verify (per policy)
+            verify = verify_mode(verify, binary_path)
+            if verify == "full":
                 success, msg = verify_integrity(binary_path, output_path)
                 if not success:
                     return {"success": False, "error": f"Integrity Fail: {msg}"}
+            elif verify == "deferred":
+                get_verify_queue().submit(binary_path, output_path, on_verified)
 
-                return {
-                    "success": True,
-                    "time": time.time() - start_time,
-                    "output_size": os.path.getsize(output_path),
-                    "final_path": output_path
-                }
+            return {
+                "success": True,
+                "time": time.time() - start_time,
+                "output_size": os.path.getsize(output_path),
+                "final_path": output_path,
+                "verify": verify
+            }
 
         # 4. Failure Diagnostics
         err_out = (process.stderr or "").strip()
@@ -109,3 +238,121 @@ def run_compressor(cmd, input_path, output_path, timeout=120):
             
     except Exception as e:
         return {"success": False, "error": f"Runner Error: {str(e)}"}
+
+STREAM_CHUNK = 1024 * 1024
+
+def _iter_source(source, chunk_size):
+    """bytes, a readable file object or any iterable of bytes -> chunks."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for pos in range(0, len(view), chunk_size):
+            yield view[pos:pos + chunk_size]
+    elif hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        yield from source
+
+def iter_stream(cmd, source=None, chunk_size=STREAM_CHUNK, timeout=None, stats=None):
+    """
+    Runs `cmd` as a pipe filter and yields its stdout in chunks.
+
+    `source` (bytes, a file object, or an iterable of bytes such as another
+    iter_stream) is fed to stdin on a writer thread while this generator reads
+    stdout, so neither side blocks on a full pipe and nothing lands on disk;
+    None leaves stdin closed (producers like `tar -cf -`). stderr is drained on
+    its own thread. A non-zero exit, a timeout or a source error raises
+    RuntimeError; closing the generator early kills the process.
+    `stats` (a dict) receives 'input_size'.
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if source is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+    )
+    errors = []
+    stderr_chunks = []
+    fed = [0]
+
+    def feed():
+        try:
+            for chunk in _iter_source(source, chunk_size):
+                process.stdin.write(chunk)
+                fed[0] += len(chunk)
+        except BrokenPipeError:
+            pass # engine exited early; its exit code tells why
+        except Exception as e:
+            errors.append(f"Source Error: {str(e)}")
+            process.kill()
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+    threads = [threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)]
+    if source is not None:
+        threads.append(threading.Thread(target=feed, daemon=True))
+    timer = None
+    if timeout:
+        def expire():
+            errors.append(f"Timeout after {timeout}s")
+            process.kill()
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+    for thread in threads:
+        thread.start()
+
+    finished = False
+    try:
+        while True:
+            chunk = process.stdout.read1(chunk_size) if hasattr(process.stdout, "read1") else process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        process.wait()
+        for thread in threads:
+            thread.join()
+        finished = True
+    finally:
+        if timer:
+            timer.cancel()
+        if not finished:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+
+    if stats is not None:
+        stats["input_size"] = fed[0]
+    if errors or process.returncode != 0:
+        err = (b"".join(stderr_chunks).decode('utf-8', errors='replace')).strip()
+        raise RuntimeError(errors[0] if errors else f"Engine Fail ({process.returncode}): {err[:100]}")
+
+def run_stream(cmd, source, sink, chunk_size=STREAM_CHUNK, timeout=None):
+    """
+    Pipes `source` through `cmd` into `sink` (a writable file object or a
+    callable taking each chunk). Returns the run_compressor-style dict, with
+    'input_size' instead of 'final_path'.
+    """
+    start_time = time.time()
+    write = sink if callable(sink) else sink.write
+    stats = {}
+    output_size = 0
+    try:
+        for chunk in iter_stream(cmd, source, chunk_size, timeout, stats):
+            write(chunk)
+            output_size += len(chunk)
+    except Exception as e:
+        return {"success": False, "error": f"Stream Error: {str(e)}"}
+    return {
+        "success": True,
+        "time": time.time() - start_time,
+        "input_size": stats.get("input_size", 0),
+        "output_size": output_size
+    }
@@ -1,9 +1,19 @@
 import math
 import time
 import os
+import sqlite3
+import threading
 import subprocess
+from collections import deque, namedtuple
+from types import MappingProxyType
 import psutil
 
+try:
+    import numpy as np
+except ImportError:  # Optional: get_best_tools falls back to the scalar path
+    np = None
+from metadata import CompressionDB
+
 # Default baselines
 PERF_LOOKUP = {
     "7zip": {"ratio_factor": 0.35, "speed_mbps": 10.0},
@@ -13,15 +23,261 @@ PERF_LOOKUP = {
     "ffmpeg": {"ratio_factor": 0.30, "speed_mbps": 15.0} # Encoding is slower but very efficient
 }
 
-DYNAMIC_PERF = PERF_LOOKUP.copy()
+EnginePerf = namedtuple('EnginePerf', ['ratio_factor', 'speed_mbps'])
+
+class PerfProfile:
+    """
+    Immutable, versioned engine performance table (tool -> EnginePerf).
+    Updates never touch a published profile: calibration derives a new version
+    and swaps it in atomically, and per-decision tweaks work on a private copy,
+    so concurrent selections always score against one consistent table.
+    """
+
+    def __init__(self, engines, version=1, source="defaults"):
+        self._engines = MappingProxyType({
+            tool: perf if isinstance(perf, EnginePerf) else EnginePerf(perf['ratio_factor'], perf['speed_mbps'])
+            for tool, perf in engines.items()
+        })
+        self.version = version
+        self.source = source
+
+    def __getitem__(self, tool):
+        return self._engines[tool]
+
+    def __iter__(self):
+        return iter(self._engines)
+
+    def __contains__(self, tool):
+        return tool in self._engines
+
+    def items(self):
+        return self._engines.items()
+
+    def evolve(self, source, updates):
+        """Next version with {tool: {field: value}} applied (e.g. calibrated speeds)."""
+        engines = {tool: perf._replace(**updates.get(tool, {})) for tool, perf in self._engines.items()}
+        return PerfProfile(engines, self.version + 1, source)
+
+    def adjusted(self, **fields):
+        """Same-version copy with `fields` overridden for every tool, for one decision only."""
+        return PerfProfile({tool: perf._replace(**fields) for tool, perf in self._engines.items()},
+                           self.version, self.source)
+
+    def __repr__(self):
+        return f"PerfProfile(v{self.version}, {self.source})"
+
+_profile = PerfProfile(PERF_LOOKUP)
+_profile_lock = threading.Lock()
+
+def get_perf_profile():
+    """The current profile; a plain reference read, so it never blocks."""
+    return _profile
+
+def update_perf_profile(source, updates):
+    """Atomically publishes current.evolve(source, updates); concurrent updates are never lost."""
+    global _profile
+    with _profile_lock:
+        _profile = _profile.evolve(source, updates)
+        return _profile
+
+# --- LEARNED MODEL ---
+# Running means of real runs from CompressionDB.history, per engine and input bucket.
+# A bucket's estimate is shrunk towards the heuristics above until it has seen
+# about MODEL_PRIOR_RUNS runs of its own.
+MODEL_PRIOR_RUNS = 3
+SIZE_BUCKETS_MB = (1, 64, 1024)
+LEARNED_MODEL = None # {(engine, bucket): (runs, ratio, speed_mbps)}, loaded on first use
+_model_lock = threading.Lock()
+
+def feature_bucket(entropy, size_bytes, is_text):
+    """Coarse input class: entropy band (0-7), size band (<1MB, <64MB, <1GB, larger), text flag."""
+    entropy_band = min(max(int(entropy or 0), 0), 7)
+    size_mb = (size_bytes or 0) / (1024 * 1024)
+    size_band = sum(size_mb >= edge for edge in SIZE_BUCKETS_MB)
+    return f"e{entropy_band}-s{size_band}-t{1 if is_text else 0}"
+
+def _update_entry(model, engine, bucket, ratio, speed_mbps):
+    """Incremental running-mean update of one model cell; returns the new (runs, ratio, speed)."""
+    runs, mean_ratio, mean_speed = model.get((engine, bucket), (0, 0.0, 0.0))
+    runs += 1
+    mean_ratio += (ratio - mean_ratio) / runs
+    mean_speed += (speed_mbps - mean_speed) / runs
+    model[(engine, bucket)] = (runs, mean_ratio, mean_speed)
+    return model[(engine, bucket)]
+
+def fit_model(runs):
+    """Fits the model from scratch from (engine, size, entropy, is_text, ratio, duration) history rows."""
+    model = {}
+    for engine, size, entropy, is_text, ratio, duration in runs:
+        _update_entry(model, engine, feature_bucket(entropy, size, is_text), ratio, size / (1024 * 1024) / duration)
+    return model
+
+def get_learned_model(db=None):
+    """
+    The persisted model; fitted once from the raw history if the model table is still empty.
+    Selection only reads: a missing history database is not created (heuristics only).
+    """
+    global LEARNED_MODEL
+    with _model_lock:
+        if LEARNED_MODEL is None:
+            try:
+                db = db or CompressionDB(create=False)
+                model = db.get_model()
+                if not model:
+                    model = fit_model(db.get_training_runs())
+                    if model:
+                        try:
+                            db.replace_model(model)
+                        except (sqlite3.Error, OSError):
+                            pass # Read-only history: refit next session
+            except (sqlite3.Error, OSError):
+                model = {} # No usable history: heuristics only
+            LEARNED_MODEL = model
+        return LEARNED_MODEL
+
+def record_run(features, engine, comp_size, duration, eco_mode=False, filename=None, db=None):
+    """
+    Logs a finished run to CompressionDB and folds it into the learned model.
+    The run already succeeded, so database errors are swallowed (as in get_learned_model):
+    the in-memory model is still updated.
+    """
+    try:
+        db = db or CompressionDB()
+    except (sqlite3.Error, OSError):
+        db = None
+    model = get_learned_model(db) # Load (or fit) before logging, so this run is counted once
+    size = features.get('size_bytes', 0)
+    if db is not None:
+        try:
+            db.log_run(filename=filename, orig_size=size, comp_size=comp_size, entropy=features.get('entropy', 0),
+                       engine=engine, duration=duration, eco_mode=eco_mode, is_text=features.get('is_text'))
+        except (sqlite3.Error, OSError):
+            db = None
+    if size <= 0 or duration <= 0:
+        return
+
+    bucket = feature_bucket(features.get('entropy'), size, features.get('is_text'))
+    ratio, speed = comp_size / size, size / (1024 * 1024) / duration
+    with _model_lock:
+        entry = None
+        if db is not None:
+            try:
+                # Atomic in SQL; the stored cell (which may include other processes' runs) wins
+                entry = db.add_model_run(engine, bucket, ratio, speed)
+            except (sqlite3.Error, OSError):
+                pass
+        if entry is None:
+            _update_entry(model, engine, bucket, ratio, speed)
+        else:
+            model[(engine, bucket)] = tuple(entry)
+
+def learned_estimate(tool, features, prior_ratio, prior_speed):
+    """Blends the heuristic (ratio, speed) with what history says for this tool and input bucket."""
+    bucket = feature_bucket(features.get('entropy'), features.get('size_bytes'), features.get('is_text'))
+    runs, ratio, speed = get_learned_model().get((tool, bucket), (0, 0.0, 0.0))
+    if not runs:
+        return prior_ratio, prior_speed
+    weight = runs / (runs + MODEL_PRIOR_RUNS)
+    return (weight * ratio + (1 - weight) * prior_ratio,
+            weight * speed + (1 - weight) * prior_speed)
+
+# --- SYSTEM STATE SAMPLER ---
+class SystemStateSampler:
+    """
+    Background thread that keeps a time-stamped snapshot of network throughput,
+    battery and available RAM, so selection never blocks on psutil (or sleeps).
+    Throughput is averaged over the samples of the last `window` seconds.
+    A snapshot older than STALE_INTERVALS intervals (thread stopped or starved)
+    is replaced by a direct sample on read.
+    """
+
+    STALE_INTERVALS = 3
+
+    def __init__(self, interval=1.0, window=5.0):
+        self.interval = interval
+        self.window = window
+        self._net = deque() # (timestamp, total bytes sent + received)
+        self._sample_lock = threading.Lock() # serializes writers only; readers never take it
+        self._stop = threading.Event()
+        self._thread = None
+        self.snapshot = None
+        self.sample() # First snapshot synchronously: readers never see None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="system-state-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def current(self):
+        """The latest snapshot, or a fresh direct sample when it has gone stale."""
+        snapshot = self.snapshot
+        if time.time() - snapshot['timestamp'] <= self.STALE_INTERVALS * self.interval:
+            return snapshot
+        return self.sample()
+
+    def sample(self):
+        with self._sample_lock:
+            return self._sample()
+
+    def _sample(self):
+        now = time.monotonic()
+        on_battery, battery_pct = False, 100
+        try:
+            battery = psutil.sensors_battery()
+            if battery:
+                on_battery, battery_pct = not battery.power_plugged, battery.percent
+        except Exception:
+            pass
+
+        net_kbps = 0.0
+        try:
+            counters = psutil.net_io_counters()
+            self._net.append((now, counters.bytes_sent + counters.bytes_recv))
+            while len(self._net) > 2 and now - self._net[0][0] > self.window:
+                self._net.popleft()
+            (t0, b0), (t1, b1) = self._net[0], self._net[-1]
+            if t1 > t0:
+                net_kbps = (b1 - b0) / 1024 / (t1 - t0)
+        except Exception:
+            pass
+
+        # Replaced whole (never mutated), so readers get a consistent view without locking
+        self.snapshot = {
+            'timestamp': time.time(),
+            'net_kbps': net_kbps,
+            'on_battery': on_battery,
+            'battery_pct': battery_pct,
+            'ram_gb': psutil.virtual_memory().available / (1024 ** 3),
+        }
+        return self.snapshot
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+def get_system_state():
+    """Latest sampler snapshot (starts the background sampler on first use; re-samples if stale)."""
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = SystemStateSampler().start()
+    return _sampler.current()
 
 def get_system_ram_safety():
     """Returns available RAM in GB."""
-    return psutil.virtual_memory().available / (1024 ** 3)
+    return get_system_state()['ram_gb']
 
 def calibrate_speeds(bin_paths):
-    """Benchmarks hardware to update speed assumptions."""
-    global DYNAMIC_PERF
+    """Benchmarks hardware and publishes the measured speeds as a new profile version."""
+    speeds = {}
     test_file = "calib_test.tmp"
     test_out = "calib_test.out"
     
@@ -41,13 +297,16 @@ def calibrate_speeds(bin_paths):
             subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, 
                            creationflags=0x08000000, timeout=5)
             duration = time.time() - start
-            DYNAMIC_PERF[tool]["speed_mbps"] = 2.0 / max(duration, 0.001)
+            speeds[tool] = {"speed_mbps": 2.0 / max(duration, 0.001)}
         except:
             pass 
 
     for f in [test_file, test_out]:
         if os.path.exists(f): os.remove(f)
 
+    if speeds:
+        update_perf_profile("calibration", speeds)
+
 def score_algo(features, perf_estimate, constraints):
     size = features.get('size_bytes', 0)
     if size <= 0 or not perf_estimate: return -99999
@@ -73,55 +332,51 @@ def score_algo(features, perf_estimate, constraints):
 
 def get_battery_status():
     """Returns (is_on_battery, percent)."""
-    try:
-        battery = psutil.sensors_battery()
-        if battery:
-            return not battery.power_plugged, battery.percent
-    except:
-        pass
-    return False, 100
+    state = get_system_state()
+    return state['on_battery'], state['battery_pct']
 
 def get_network_status():
     """Returns (is_congested, speed_kbps)."""
-    try:
-        net1 = psutil.net_io_counters()
-        time.sleep(0.1)
-        net2 = psutil.net_io_counters()
-        # Calculate KB/s
-        speed = ((net2.bytes_sent - net1.bytes_sent) + (net2.bytes_recv - net1.bytes_recv)) / 102.4
-        return speed > 500, speed # Congested if > 500 KB/s
-    except:
-        return False, 0
-
-def get_best_tool(features, constraints):
+    speed = get_system_state()['net_kbps']
+    return speed > 500, speed # Congested if > 500 KB/s
+
+def _decision_context(constraints, state):
     """
-    Final decision engine with Memory, Power & Network Guard.
+    Constraints after the power / network guards, plus the excluded engines: RAM-restricted
+    ones and, when constraints['engines'] lists the installed engines, every other one.
     """
-    if not features: return "zstd"
-
-    # --- POWER GUARD ---
-    on_battery, battery_pct = get_battery_status()
+    on_battery, battery_pct = state['on_battery'], state['battery_pct']
     actual_constraints = constraints.copy()
-    
-    # If on battery, we favor SPEED to save energy
     if on_battery:
         if actual_constraints.get('priority') == 'size':
             actual_constraints['priority'] = 'balanced'
         elif actual_constraints.get('priority') == 'balanced':
             actual_constraints['priority'] = 'speed'
-
-    # --- NETWORK GUARD ---
-    # If network is busy, prioritize SIZE to save upload bandwidth
-    is_congested, _ = get_network_status()
-    if is_congested and constraints.get('network_aware', True):
+    if state['net_kbps'] > 500 and constraints.get('network_aware', True):
         actual_constraints['priority'] = 'size'
+    excluded = []
+    if state['ram_gb'] < 3.0 or (on_battery and battery_pct < 25):
+        excluded.append("paq")
+    installed = constraints.get('engines')
+    if installed is not None:
+        excluded.extend(tool for tool in PERF_LOOKUP if tool not in installed and tool not in excluded)
+    return actual_constraints, excluded
+
+def get_best_tool(features, constraints, profile=None):
+    """
+    Final decision engine with Memory, Power & Network Guard.
+    constraints: 'priority', 'max_time', 'network_aware', and optionally 'engines' (the
+                 installed engines; others are never picked, media falls back to scoring).
+    profile: PerfProfile to score against (defaults to the current one), for reproducible decisions.
+    """
+    if not features: return "zstd"
+    profile = profile or get_perf_profile()
 
-    # --- MEMORY GUARD ---
-    available_ram = get_system_ram_safety()
-    # PAQ is extremely RAM hungry. If RAM < 3GB, we force-disable PAQ.
-    ram_restricted = []
-    if available_ram < 3.0 or (on_battery and battery_pct < 25):
-        ram_restricted.append("paq")
+    # --- POWER / NETWORK / MEMORY GUARDS ---
+    # One sampler snapshot for the whole decision (no psutil calls, no sleep).
+    # On battery we favor SPEED to save energy; a busy network favors SIZE to save
+    # upload bandwidth; PAQ is disabled when RAM (< 3GB) or battery (< 25%) is low.
+    actual_constraints, excluded = _decision_context(constraints, get_system_state())
 
     # --- FEATURE EXTRACTION ---
     entropy = features.get('entropy', 0)
@@ -136,20 +391,20 @@ def get_best_tool(features, constraints):
     if is_image:
         # If it's an image, WebP is almost always superior for ratio
         if entropy < 7.9:
-            return "webp"
+            if "webp" not in excluded:
+                return "webp"
         else:
-            # Already optimized image
-            for tool in DYNAMIC_PERF:
-                 DYNAMIC_PERF[tool]['ratio_factor'] = 0.99
+            # Already optimized image: nothing will shrink it (this decision only)
+            profile = profile.adjusted(ratio_factor=0.99)
     
     if is_video:
         # For video, FFmpeg is the absolute king
         if entropy < 7.9:
-            return "ffmpeg"
+            if "ffmpeg" not in excluded:
+                return "ffmpeg"
         else:
-            # Already compressed video
-            for tool in DYNAMIC_PERF:
-                 DYNAMIC_PERF[tool]['ratio_factor'] = 0.99
+            # Already compressed video (this decision only)
+            profile = profile.adjusted(ratio_factor=0.99)
              
     best_tool = "zstd"
     best_score = -float('inf')
@@ -158,9 +413,9 @@ def get_best_tool(features, constraints):
     if entropy >= 7.99 and not is_media:
         return "SKIP"
 
-    for tool, stats in DYNAMIC_PERF.items():
+    for tool, stats in profile.items():
         # --- Engine Filtering ---
-        if tool in ram_restricted: continue
+        if tool in excluded: continue
         
         # WEBP is only for images
         if tool == "webp" and not is_image: continue
@@ -172,15 +427,16 @@ def get_best_tool(features, constraints):
         if size_mb > 500 and tool == "paq": continue
 
         # --- Scoring ---
-        predicted_ratio = max(stats['ratio_factor'], entropy / 8.0)
+        predicted_ratio = max(stats.ratio_factor, entropy / 8.0)
         if repetition > 0.2:
             predicted_ratio -= (repetition * 0.12)
 
         predicted_ratio = max(0.01, min(predicted_ratio, 1.01))
+        predicted_ratio, speed_mbps = learned_estimate(tool, features, predicted_ratio, stats.speed_mbps)
         
         estimate = {
             'expected_size': features['size_bytes'] * predicted_ratio,
-            'expected_time': size_mb / stats['speed_mbps']
+            'expected_time': size_mb / max(speed_mbps, 0.001)
         }
         
         score = score_algo(features, estimate, actual_constraints)
@@ -189,4 +445,117 @@ def get_best_tool(features, constraints):
             best_score = score
             best_tool = tool
             
-    return best_tool
\ No newline at end of file
+    return best_tool
+
+# --- BATCH SELECTION ---
+BATCH_COLUMNS = ('entropy', 'repetition', 'size_bytes', 'is_image', 'is_video', 'is_text')
+# Optional 'valid' column: False rows (no features, e.g. unreadable files) get "zstd" like get_best_tool(None)
+
+def features_to_batch(features_list):
+    """Columnar batch (dict of NumPy arrays) from a list of sample_features() dicts."""
+    rows = [f or {} for f in features_list]
+    visual = [f.get('visual') or {} for f in rows]
+    return {
+        'entropy': np.array([f.get('entropy', 0) for f in rows], dtype=np.float64),
+        'repetition': np.array([f.get('repetition', 0) for f in rows], dtype=np.float64),
+        'size_bytes': np.array([f.get('size_bytes', 0) for f in rows], dtype=np.float64),
+        'is_image': np.array([v.get('is_image', False) for v in visual], dtype=bool),
+        'is_video': np.array([v.get('is_video', False) for v in visual], dtype=bool),
+        'is_text': np.array([f.get('is_text', False) for f in rows], dtype=bool),
+        'valid': np.array([bool(f) for f in rows], dtype=bool),
+    }
+
+def _model_columns(tool, model):
+    """runs / ratio / speed of one tool's learned cells, indexed by bucket code (see _bucket_codes)."""
+    runs, ratio, speed = np.zeros(64), np.zeros(64), np.zeros(64)
+    for entropy_band in range(8):
+        for size_band in range(4):
+            for text in (0, 1):
+                cell = model.get((tool, f"e{entropy_band}-s{size_band}-t{text}"))
+                if cell:
+                    code = entropy_band * 8 + size_band * 2 + text
+                    runs[code], ratio[code], speed[code] = cell
+    return runs, ratio, speed
+
+def _bucket_codes(entropy, size_bytes, is_text):
+    """Vectorised feature_bucket(): entropy band * 8 + size band * 2 + text flag."""
+    entropy_band = np.clip(np.floor(entropy), 0, 7).astype(np.int64)
+    size_band = np.searchsorted(np.array(SIZE_BUCKETS_MB, dtype=np.float64), size_bytes / (1024 * 1024), side='right')
+    return entropy_band * 8 + size_band * 2 + is_text.astype(np.int64)
+
+def get_best_tools(features_batch, constraints, profile=None):
+    """
+    get_best_tool() for a whole batch: `features_batch` maps BATCH_COLUMNS to equal-length
+    NumPy arrays (see features_to_batch). Every engine x file score is computed in one
+    vectorised pass against a single profile / system snapshot; returns one tool per file.
+    """
+    if np is None:
+        raise ImportError("get_best_tools needs NumPy; use get_best_tool per file instead")
+    profile = profile or get_perf_profile()
+    actual_constraints, excluded = _decision_context(constraints, get_system_state())
+    model = get_learned_model()
+
+    entropy = np.asarray(features_batch['entropy'], dtype=np.float64)
+    repetition = np.asarray(features_batch['repetition'], dtype=np.float64)
+    size = np.asarray(features_batch['size_bytes'], dtype=np.float64)
+    is_image = np.asarray(features_batch['is_image'], dtype=bool)
+    is_video = np.asarray(features_batch['is_video'], dtype=bool)
+    is_text = np.asarray(features_batch.get('is_text', np.zeros(len(entropy), dtype=bool)), dtype=bool)
+    size_mb = size / (1024 * 1024)
+    codes = _bucket_codes(entropy, size, is_text)
+
+    # Already-compressed media: every engine's ratio_factor is pinned to 0.99 for that file
+    pinned = (is_image | is_video) & (entropy >= 7.9)
+
+    priority = actual_constraints.get('priority', 'balanced')
+    if priority == 'size':
+        w_gain, w_time = 25.0, 0.5
+    elif priority == 'speed':
+        w_gain, w_time = 1.0, 20.0
+    else:
+        w_gain, w_time = 8.0, 4.0
+    max_t = actual_constraints.get('max_time', 60)
+
+    tools = list(profile)
+    scores = np.full((len(tools), len(entropy)), -np.inf)
+    for row, tool in enumerate(tools):
+        if tool in excluded:
+            continue
+        stats = profile[tool]
+        eligible = np.ones(len(entropy), dtype=bool)
+        if tool == "webp":
+            eligible &= is_image
+        if tool == "ffmpeg":
+            eligible &= is_video
+        if tool == "paq":
+            eligible &= ~(size_mb > 500)
+
+        predicted_ratio = np.maximum(np.where(pinned, 0.99, stats.ratio_factor), entropy / 8.0)
+        predicted_ratio = np.where(repetition > 0.2, predicted_ratio - repetition * 0.12, predicted_ratio)
+        predicted_ratio = np.clip(predicted_ratio, 0.01, 1.01)
+
+        runs, cell_ratio, cell_speed = (column[codes] for column in _model_columns(tool, model))
+        weight = runs / (runs + MODEL_PRIOR_RUNS)
+        learned = runs > 0
+        predicted_ratio = np.where(learned, weight * cell_ratio + (1 - weight) * predicted_ratio, predicted_ratio)
+        speed_mbps = np.where(learned, weight * cell_speed + (1 - weight) * stats.speed_mbps, stats.speed_mbps)
+
+        expected_time = size_mb / np.maximum(speed_mbps, 0.001)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gain = (size - size * predicted_ratio) / size
+        score = (w_gain * gain) - (w_time * (expected_time / (max_t if max_t > 0 else 1)))
+        score = np.where(expected_time > max_t, score - 500, score)
+        score = np.where(size > 0, score, -99999)
+        scores[row] = np.where(eligible, score, -np.inf)
+
+    # argmax keeps the first of equal scores, like the scalar loop's strict '>'
+    choice = np.array(tools, dtype=object)[np.argmax(scores, axis=0)]
+    choice[~np.isfinite(scores.max(axis=0))] = "zstd"
+    choice = np.where((entropy >= 7.99) & ~(is_image | is_video), "SKIP", choice)
+    if "ffmpeg" not in excluded:
+        choice = np.where(is_video & (entropy < 7.9), "ffmpeg", choice)
+    if "webp" not in excluded:
+        choice = np.where(is_image & (entropy < 7.9), "webp", choice)
+    if 'valid' in features_batch:
+        choice = np.where(np.asarray(features_batch['valid'], dtype=bool), choice, "zstd")
+    return choice.tolist()
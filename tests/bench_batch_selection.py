@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import random
+
+# Add current dir to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import selector
+
+def synthetic_features(n, seed=42):
+    """Feature rows shaped like analyzer.sample_features() output (text, binary, media, incompressible)."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        kind = rng.random()
+        is_image = kind < 0.1
+        is_video = 0.1 <= kind < 0.15
+        rows.append({
+            'entropy': rng.choice([rng.uniform(0, 8), rng.uniform(7.8, 8.0)]),
+            'repetition': rng.uniform(0, 0.6),
+            'size_bytes': int(10 ** rng.uniform(0, 10.5)),
+            'is_text': rng.random() < 0.4,
+            'visual': {'is_image': is_image, 'is_video': is_video},
+        })
+    rows[0] = None # unreadable file
+    rows[1]['size_bytes'] = 0 # empty file
+    return rows
+
+def synthetic_model():
+    """A learned model covering a few buckets, so the blending path is exercised too."""
+    rng = random.Random(7)
+    runs = [(rng.choice(["zstd", "7zip", "paq"]), int(10 ** rng.uniform(3, 9)), rng.uniform(0, 8),
+             rng.random() < 0.5, rng.uniform(0.1, 1.0), rng.uniform(0.01, 30)) for _ in range(500)]
+    return selector.fit_model(runs)
+
+def run_benchmark(n=100_000):
+    print(f"=== BATCH SELECTION BENCHMARK ({n} files) ===\n")
+    selector.LEARNED_MODEL = synthetic_model() # Pin the model: both paths must see the same one
+    profile = selector.get_perf_profile()
+    rows = synthetic_features(n)
+    constraints = {'priority': 'balanced', 'max_time': 60}
+
+    start = time.perf_counter()
+    scalar = [selector.get_best_tool(f, constraints, profile) for f in rows]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = selector.features_to_batch(rows)
+    convert_time = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorised = selector.get_best_tools(batch, constraints, profile)
+    batch_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(scalar, vectorised) if a != b)
+    print(f"scalar get_best_tool   | {scalar_time * 1000:9.1f} ms | {scalar_time / n * 1e6:6.2f} us/file")
+    print(f"features_to_batch      | {convert_time * 1000:9.1f} ms")
+    print(f"vectorised get_best_tools | {batch_time * 1000:6.1f} ms | {scalar_time / batch_time:6.1f}x")
+    print(f"\n{'[OK]' if not mismatches else '[FAIL]'} decisions identical: {n - mismatches}/{n}")
+    return not mismatches
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
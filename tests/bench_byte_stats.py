@@ -0,0 +1,47 @@
+import os
+import sys
+import math
+import timeit
+from collections import Counter
+
+# Add current dir to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from engine_v3 import kernels
+
+def legacy_stats(data):
+    """The pre-kernel analyzer path: Counter entropy + a Python loop for text bytes."""
+    entropy = 0
+    counts = Counter(data)
+    for count in counts.values():
+        p_x = count / len(data)
+        entropy -= p_x * math.log2(p_x)
+    text_chars = sum(1 for c in data if 32 <= c <= 126 or c in (9, 10, 13))
+    return entropy, text_chars / len(data), data.count(0)
+
+def bench(label, data, repeat=5):
+    number = max(1, (4 * 1024 * 1024) // len(data))
+    old = min(timeit.repeat(lambda: legacy_stats(data), number=number, repeat=repeat)) / number
+    new = min(timeit.repeat(lambda: kernels.byte_stats(memoryview(data)), number=number, repeat=repeat)) / number
+
+    ref_entropy = legacy_stats(data)[0]
+    got_entropy = kernels.byte_stats(data)['entropy']
+    assert abs(ref_entropy - got_entropy) < 1e-9, (ref_entropy, got_entropy)
+
+    print(f"{label:<22} | legacy {old * 1000:9.3f} ms | kernel {new * 1000:8.3f} ms | {old / new:6.1f}x")
+
+def run_benchmark():
+    backend = "numpy" if kernels.np is not None else "pure-python fallback"
+    print(f"=== BYTE STATS MICROBENCHMARK ({backend}) ===\n")
+    text = (b"the quick brown fox jumps over the lazy dog 0123456789\n" * 20000)[:1024 * 1024]
+    noise = os.urandom(1024 * 1024)
+
+    bench("16KB text sample", text[:16384])
+    bench("64KB random sample", noise[:65536])
+    bench("1MB text chunk", text)
+    bench("1MB random chunk", noise)
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,79 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+
+# Add current dir to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import cli
+from compressor_manager import CompressorManager
+
+def setup_test_env():
+    test_root = os.path.join(current_dir, "cli_workspace")
+    if os.path.exists(test_root):
+        shutil.rmtree(test_root)
+    os.makedirs(test_root)
+    return test_root
+
+def run_cli(*argv):
+    """(exit code, JSON records) of one `python -m cli --jsonl ...` run."""
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+        code = cli.main(["--jsonl", *argv])
+    return code, [json.loads(line) for line in stdout.getvalue().splitlines() if line.startswith("{")]
+
+def check_engine_roundtrip(root, engine):
+    """compress --engine X, then verify and decompress the archive the CLI just wrote."""
+    src = os.path.join(root, f"{engine}_input.txt")
+    with open(src, "wb") as f:
+        f.write(b"".join(f"line {i}: the quick brown fox\n".encode() for i in range(20000)))
+
+    code, records = run_cli("compress", src, "--engine", engine, "--verify", "none")
+    archive = records[0].get("output") if records else None
+    if code != 0 or not archive or not os.path.isfile(archive):
+        print(f"[FAIL] {engine} compress: {records}")
+        return False
+
+    code, records = run_cli("verify", archive)
+    if code != 0 or not records[0]["success"]:
+        print(f"[FAIL] {engine} verify {os.path.basename(archive)}: {records}")
+        return False
+
+    out_dir = os.path.join(root, f"{engine}_restored")
+    code, records = run_cli("decompress", archive, "-o", out_dir)
+    restored = os.path.join(out_dir, os.path.basename(src))
+    if code != 0 or not os.path.isfile(restored):
+        print(f"[FAIL] {engine} decompress {os.path.basename(archive)}: {records}")
+        return False
+    with open(src, "rb") as a, open(restored, "rb") as b:
+        if a.read() != b.read():
+            print(f"[FAIL] {engine}: restored file differs")
+            return False
+    print(f"[OK] {engine}: compress -> verify -> decompress of {os.path.basename(archive)}")
+    return True
+
+def test_cli():
+    root = setup_test_env()
+    results = []
+
+    print("\n--- CLI: Engine Round-trips ---")
+    manager = CompressorManager()
+    engines = [engine for engine in ("zstd", "7zip") if manager.available(engine)]
+    if not engines:
+        print("[FAIL] round-trip checks need zstd or 7za")
+        results.append(False)
+    for engine in engines:
+        results.append(check_engine_roundtrip(root, engine))
+
+    shutil.rmtree(root, ignore_errors=True)
+    return all(results)
+
+if __name__ == "__main__":
+    ok = test_cli()
+    print("\n=== CLI VERIFICATION", "PASSED ===" if ok else "FAILED ===")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,148 @@
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+# Add current dir to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from feature_cache import FeatureCache
+
+SAMPLE_KB = 64
+
+def setup_test_env():
+    test_root = os.path.join(current_dir, "cache_workspace")
+    if os.path.exists(test_root):
+        shutil.rmtree(test_root)
+    os.makedirs(test_root)
+    return test_root
+
+def write(path, data, mtime_ns=None):
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+def features_for(path):
+    return {'entropy': 4.0, 'size_bytes': os.path.getsize(path), 'visual': {'dimensions': (4, 2)}, 'tag': path}
+
+def check_invalidation(root):
+    """A row is served only while size, mtime_ns and inode all match, from memory and from disk."""
+    db = os.path.join(root, "invalidation.db")
+    path = write(os.path.join(root, "doc.txt"), b"a" * 1000, mtime_ns=1_600_000_000_000_000_000)
+    cache = FeatureCache(db)
+    cache.put(path, SAMPLE_KB, os.stat(path), features_for(path))
+    problems = []
+
+    def lookups():
+        """(memory-layer hit, disk-layer hit) for the file as it is now."""
+        fresh = FeatureCache(db) # empty LRU: answers come from SQLite
+        try:
+            return cache.get(path, SAMPLE_KB, os.stat(path)), fresh.get(path, SAMPLE_KB, os.stat(path))
+        finally:
+            fresh.close()
+
+    memory, disk = lookups()
+    if memory != features_for(path) or disk != features_for(path):
+        problems.append(f"unchanged file missed: {memory} / {disk}")
+    elif disk['visual']['dimensions'] != (4, 2):
+        problems.append("dimensions not restored as a tuple")
+
+    changes = {
+        "size": lambda: write(path, b"a" * 1001, mtime_ns=1_600_000_000_000_000_000),
+        "mtime_ns": lambda: os.utime(path, ns=(1_600_000_000_000_000_001,) * 2),
+        # Same size and mtime, new file object (editors save by rename)
+        "inode": lambda: (write(path + ".new", b"b" * 1001, mtime_ns=1_600_000_000_000_000_001),
+                          os.replace(path + ".new", path)),
+    }
+    for change, apply in changes.items():
+        cache.put(path, SAMPLE_KB, os.stat(path), features_for(path))
+        before = os.stat(path)
+        apply()
+        after = os.stat(path)
+        if FeatureCache.signature(before) == FeatureCache.signature(after):
+            problems.append(f"{change}: file system did not change the signature")
+            continue
+        hits = [hit for hit in lookups() if hit is not None]
+        if hits:
+            problems.append(f"{change}: stale entry served")
+    cache.close()
+    if problems:
+        print(f"[FAIL] invalidation: {'; '.join(problems)}")
+        return False
+    print("[OK] invalidation: size, mtime_ns and inode changes all miss (memory and SQLite)")
+    return True
+
+def check_lru_and_trim(root):
+    db = os.path.join(root, "trim.db")
+    files = [write(os.path.join(root, f"f{i}.bin"), bytes([i]) * 100) for i in range(11)]
+    cache = FeatureCache(db, max_memory=2, max_rows=10)
+    problems = []
+
+    for path in files[:10]:
+        cache.put(path, SAMPLE_KB, os.stat(path), features_for(path))
+        time.sleep(0.002) # distinct last_used stamps
+    if [key[0] for key in cache._memory] != [os.path.abspath(p) for p in files[8:10]]:
+        problems.append(f"memory LRU holds {[os.path.basename(k[0]) for k in cache._memory]}")
+
+    # f0 is read back (from disk, it left the LRU), so f1 and f2 are now the least recently used
+    if cache.get(files[0], SAMPLE_KB, os.stat(files[0])) != features_for(files[0]):
+        problems.append("evicted entry not served from SQLite")
+    time.sleep(0.002)
+    cache.put(files[10], SAMPLE_KB, os.stat(files[10]), features_for(files[10]))
+    cache.close()
+
+    with sqlite3.connect(db) as conn:
+        kept = {os.path.basename(row[0]) for row in conn.execute("SELECT path FROM features")}
+    expected = {os.path.basename(p) for p in files} - {"f1.bin", "f2.bin"}
+    if kept != expected:
+        problems.append(f"after trim kept {sorted(kept)}")
+    if problems:
+        print(f"[FAIL] lru / trim: {'; '.join(problems)}")
+        return False
+    print(f"[OK] lru / trim: memory bounded to 2, table trimmed to {len(kept)} of max 10 rows, LRU rows dropped")
+    return True
+
+def check_memory_fallback(root):
+    """An unusable database location leaves a working memory-only cache."""
+    blocker = write(os.path.join(root, "not_a_folder"), b"")
+    path = write(os.path.join(root, "fallback.txt"), b"x" * 500)
+    problems = []
+    for label, db in (("folder is a file", os.path.join(blocker, "cache.db")),
+                      ("database is garbage", write(os.path.join(root, "garbage.db"), b"not sqlite" * 1000))):
+        cache = FeatureCache(db)
+        if cache.db_path is not None:
+            problems.append(f"{label}: opened {cache.db_path}")
+        cache.put(path, SAMPLE_KB, os.stat(path), features_for(path))
+        if cache.get(path, SAMPLE_KB, os.stat(path)) != features_for(path):
+            problems.append(f"{label}: memory layer not serving")
+        cache.clear()
+        if cache.get(path, SAMPLE_KB, os.stat(path)) is not None:
+            problems.append(f"{label}: clear() left entries")
+        cache.close()
+    if problems:
+        print(f"[FAIL] fallback: {'; '.join(problems)}")
+        return False
+    print("[OK] fallback: unwritable / corrupt database falls back to the in-memory LRU")
+    return True
+
+def test_feature_cache():
+    root = setup_test_env()
+    results = []
+
+    print("\n--- Feature Cache ---")
+    results.append(check_invalidation(root))
+    results.append(check_lru_and_trim(root))
+    results.append(check_memory_fallback(root))
+
+    shutil.rmtree(root, ignore_errors=True)
+    return all(results)
+
+if __name__ == "__main__":
+    ok = test_feature_cache()
+    print("\n=== FEATURE CACHE VERIFICATION", "PASSED ===" if ok else "FAILED ===")
+    sys.exit(0 if ok else 1)
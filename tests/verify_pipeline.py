@@ -0,0 +1,191 @@
+import os
+import shutil
+import sys
+import threading
+import time
+
+# Add current dir to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import selector
+from compressor_manager import CompressorManager
+from pipeline import BatchPipeline, ResourceBudget
+
+def setup_test_env():
+    test_root = os.path.join(current_dir, "pipeline_workspace")
+    if os.path.exists(test_root):
+        shutil.rmtree(test_root)
+    os.makedirs(test_root)
+    return test_root
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def manager_with(*engines):
+    """A real CompressorManager, as on a host where only `engines` are installed (selection only for fakes)."""
+    manager = CompressorManager()
+    manager.bins = {tool: (path or os.path.join(manager.bin, tool)) if tool in engines else None
+                    for tool, path in manager.bins.items()}
+    return manager
+
+class RecordedRuns:
+    """Collects selector.record_run calls so the checks never write to the history database."""
+
+    def __init__(self):
+        self.runs = []
+        self._original = selector.record_run
+
+    def __enter__(self):
+        selector.record_run = lambda features, engine, **kwargs: self.runs.append(engine)
+        return self
+
+    def __exit__(self, *exc):
+        selector.record_run = self._original
+        return False
+
+def check_collect(root):
+    folder = os.path.join(root, "collect")
+    text = write(os.path.join(folder, "notes.txt"), b"notes\n" * 100)
+    earlier = write(text + ".adapt", b"earlier zstd output")
+    earlier_v3 = write(text + ".adaptive", b"earlier v3 output")
+    video = write(os.path.join(folder, "clip.mp4"), os.urandom(2048))
+    bundle = write(os.path.join(folder, "sub", "bundle.tar"), os.urandom(2048))
+    missing = os.path.join(root, "missing.bin")
+
+    kept, excluded = BatchPipeline.collect([folder, missing])
+    reasons = dict(excluded)
+    problems = []
+    if sorted(kept) != sorted([text, video, bundle]):
+        problems.append(f"kept {kept}")
+    if set(reasons) != {earlier, earlier_v3, missing} or reasons[missing] != "Not found.":
+        problems.append(f"excluded {excluded}")
+    if problems:
+        print(f"[FAIL] collect: {'; '.join(problems)}")
+        return False
+    print("[OK] collect: earlier outputs and missing paths excluded, other .mp4/.tar inputs kept")
+    return True
+
+def check_budget():
+    budget = ResourceBudget(cpu_slots=2, ram_gb=1.0, headroom_gb=0.0, poll=0.05)
+    problems = []
+    first = budget.acquire(1, 0.8)
+    admitted = threading.Event()
+
+    def second():
+        slots = budget.acquire(1, 0.5) # 0.8 + 0.5 exceeds the 1 GB budget
+        admitted.set()
+        budget.release(slots, 0.5)
+
+    waiter = threading.Thread(target=second)
+    waiter.start()
+    if admitted.wait(0.3):
+        problems.append("job admitted past the RAM budget")
+    budget.release(first, 0.8)
+    if not admitted.wait(2.0):
+        problems.append("waiting job not admitted after release")
+    waiter.join(2.0)
+
+    # A job larger than the whole budget runs alone instead of never
+    start = time.perf_counter()
+    slots = budget.acquire(8, 10.0)
+    if slots != 2 or time.perf_counter() - start > 0.5:
+        problems.append(f"oversized job: {slots} slots after {time.perf_counter() - start:.2f}s")
+    budget.release(slots, 10.0)
+    if budget.used_slots or budget.used_ram:
+        problems.append(f"budget not returned: {budget.used_slots} slots, {budget.used_ram} GB")
+    if problems:
+        print(f"[FAIL] budget: {'; '.join(problems)}")
+        return False
+    print("[OK] budget: over-budget job waits for a release, oversized job runs alone")
+    return True
+
+def check_largest_first(root):
+    folder = os.path.join(root, "order")
+    sizes = [30, 200, 5, 120, 60]
+    for i, kb in enumerate(sizes):
+        write(os.path.join(folder, f"f{i}.txt"), f"file {i} ".encode() * (kb * 128))
+    order = []
+    batch = BatchPipeline(manager=manager_with("zstd"), workers=1, force_tool="zstd", verify="none")
+    with RecordedRuns() as recorded:
+        results = batch.run([folder], on_result=lambda r: order.append(os.path.getsize(r["path"])))
+    if not all(r["success"] for r in results) or order != sorted(order, reverse=True) or len(recorded.runs) != len(sizes):
+        print(f"[FAIL] largest-first: sizes in completion order {order}, results {results}")
+        return False
+    print(f"[OK] largest-first: {len(order)} files compressed in decreasing size order")
+    return True
+
+def check_unavailable_fallback(root):
+    folder = os.path.join(root, "fallback")
+    for i in range(3):
+        write(os.path.join(folder, f"log{i}.txt"), f"{i} the quick brown fox\n".encode() * 40000)
+    write(os.path.join(folder, "table.bin"), bytes(i * i % 13 for i in range(1 << 20)))
+    files, _ = BatchPipeline.collect([folder])
+    problems = []
+
+    # What the selector would like on a fully equipped host, per priority
+    full = BatchPipeline(manager=manager_with(*selector.PERF_LOOKUP), priority="size")
+    wanted = set(full.select(full.analyze(files)))
+    if wanted <= {"zstd", "SKIP"}:
+        problems.append(f"probe files never pick a missing engine: {wanted}")
+
+    batch = BatchPipeline(manager=manager_with("zstd", "tar"), priority="size", verify="none")
+    features = batch.analyze(files)
+    picks = batch.select(features)
+    numpy = selector.np
+    selector.np = None # Scalar get_best_tool path
+    try:
+        scalar_picks = batch.select(features)
+    finally:
+        selector.np = numpy
+    if set(picks) - {"zstd", "SKIP"} or picks != scalar_picks:
+        problems.append(f"picks {picks} (scalar {scalar_picks})")
+
+    with RecordedRuns():
+        results = batch.run([folder])
+    if not all(r["success"] for r in results):
+        problems.append(f"results {[r.get('error') for r in results]}")
+
+    forced = BatchPipeline(manager=manager_with("zstd"), force_tool="7zip", verify="none")
+    errors = {r.get("error") for r in forced.run(files)}
+    if errors != {"Engine unavailable: 7zip"}:
+        problems.append(f"forced missing engine: {errors}")
+    if problems:
+        print(f"[FAIL] unavailable engines: {'; '.join(problems)}")
+        return False
+    print(f"[OK] unavailable engines: auto picks {sorted(wanted)} fall back to {sorted(set(picks))}, "
+          "forced missing engine reported")
+    return True
+
+def test_pipeline():
+    root = setup_test_env()
+    selector.LEARNED_MODEL = {} # Heuristics only: no history database
+    # Fixed machine state (mains power, idle network, plenty of RAM) for reproducible picks
+    sampler = selector.SystemStateSampler(interval=3600)
+    sampler.snapshot = dict(sampler.snapshot, net_kbps=0.0, on_battery=False, battery_pct=100, ram_gb=16.0)
+    selector._sampler = sampler
+    results = []
+
+    print("\n--- Pipeline: Inputs ---")
+    results.append(check_collect(root))
+
+    print("\n--- Pipeline: Scheduling ---")
+    results.append(check_budget())
+    if not CompressorManager().available("zstd"):
+        print("[FAIL] compression checks need zstd")
+        results.append(False)
+    else:
+        results.append(check_largest_first(root))
+        results.append(check_unavailable_fallback(root))
+
+    shutil.rmtree(root, ignore_errors=True)
+    return all(results)
+
+if __name__ == "__main__":
+    ok = test_pipeline()
+    print("\n=== PIPELINE VERIFICATION", "PASSED ===" if ok else "FAILED ===")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,349 @@
+import io
+import os
+import asyncio
+import contextlib
+import shutil
+import stat
+import sys
+import time
+import filecmp
+import threading
+
+# Add current dir to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import psutil
+
+import runner
+import async_runner
+from compressor_manager import CompressorManager
+
+def setup_test_env():
+    test_root = os.path.join(current_dir, "runner_workspace")
+    if os.path.exists(test_root):
+        shutil.rmtree(test_root)
+    os.makedirs(test_root)
+    return test_root
+
+def leftover_children():
+    """Child processes still around (a zombie counts: it was never waited for)."""
+    return [f"{p.pid} ({p.status()})" for p in psutil.Process().children(recursive=True)]
+
+def check_stream(name, fn, expect_error=None):
+    """Runs fn(); passes when it returns True (or raises `expect_error`) and no child is left behind."""
+    try:
+        outcome = fn()
+        error = None
+    except RuntimeError as e:
+        outcome, error = None, str(e)
+    children = leftover_children()
+    if expect_error:
+        ok = error is not None and expect_error in error
+        detail = error or "no error raised"
+    else:
+        ok = outcome is True
+        detail = error or outcome
+    if children:
+        ok, detail = False, f"{detail}; children not reaped: {children}"
+    print(f"[{'OK' if ok else 'FAIL'}] stream {name}: {detail}")
+    return ok
+
+def stream_checks(root):
+    manager = CompressorManager()
+    zstd, unzstd = manager.get_stream_command("zstd"), manager.get_stream_command("zstd", decompress=True)
+    data = os.urandom(256 * 1024) + b"stream me " * 300000
+
+    def cat_passthrough():
+        return b"".join(runner.iter_stream(["cat"], io.BytesIO(data), chunk_size=65536)) == data
+
+    def zstd_roundtrip():
+        # Two engines chained without a temp file: compress feeds decompress
+        restored = b"".join(runner.iter_stream(unzstd, runner.iter_stream(zstd, data)))
+        return restored == data
+
+    def run_stream_sink():
+        sink = io.BytesIO()
+        result = runner.run_stream(zstd, data, sink)
+        return (result["success"] and result["input_size"] == len(data)
+                and result["output_size"] == len(sink.getvalue()) < len(data)) or result
+
+    def tar_tree():
+        src = os.path.join(root, "tree")
+        os.makedirs(os.path.join(src, "sub"))
+        for i in range(5):
+            with open(os.path.join(src, "sub" if i % 2 else "", f"f{i}.txt"), "wb") as f:
+                f.write(os.urandom(1000) * (i + 1))
+        out = os.path.join(root, "untarred")
+        os.makedirs(out)
+        pack = manager.get_stream_command("tar", input_p=src)
+        unpack = manager.get_stream_command("tar", decompress=True, out_dir=out)
+        result = runner.run_stream(unpack, runner.iter_stream(pack), lambda chunk: None)
+        if not result["success"]:
+            return result
+        compared = filecmp.dircmp(src, os.path.join(out, "tree"))
+        return not (compared.diff_files or compared.left_only or compared.right_only) or "trees differ"
+
+    def failing_engine():
+        return b"".join(runner.iter_stream(unzstd, b"definitely not a zstd frame" * 100))
+
+    def slow_engine():
+        start = time.time()
+        try:
+            b"".join(runner.iter_stream(["sleep", "10"], timeout=0.5))
+        finally:
+            if time.time() - start > 5:
+                raise RuntimeError("timeout did not stop the engine")
+
+    def broken_source():
+        def chunks():
+            yield data[:65536]
+            raise IOError("disk vanished")
+        return b"".join(runner.iter_stream(["cat"], chunks()))
+
+    def early_close():
+        stream = runner.iter_stream(["cat"], iter([data] * 64), chunk_size=65536)
+        next(stream)
+        stream.close()
+        return True
+
+    def run_stream_failure():
+        result = runner.run_stream(["sleep", "10"], None, lambda chunk: None, timeout=0.5)
+        return (not result["success"] and "Timeout" in result["error"]) or result
+
+    return [
+        check_stream("cat passthrough", cat_passthrough),
+        check_stream("zstd -> zstd -d chain", zstd_roundtrip),
+        check_stream("run_stream into a file object", run_stream_sink),
+        check_stream("tar pack -> unpack", tar_tree),
+        check_stream("non-zero exit", failing_engine, expect_error="Engine Fail"),
+        check_stream("timeout", slow_engine, expect_error="Timeout after 0.5s"),
+        check_stream("source raising mid-stream", broken_source, expect_error="Source Error: disk vanished"),
+        check_stream("closed early", early_close),
+        check_stream("run_stream timeout", run_stream_failure),
+    ]
+
+class CountingVerifier:
+    """Wraps runner.verify_integrity to record which archives were tested, and on which thread."""
+
+    def __init__(self):
+        self.calls = []
+        self._original = runner.verify_integrity
+
+    def __enter__(self):
+        def verify(binary_path, archive_path):
+            self.calls.append((archive_path, threading.current_thread().name))
+            return self._original(binary_path, archive_path)
+        runner.verify_integrity = verify
+        return self
+
+    def __exit__(self, *exc):
+        runner.verify_integrity = self._original
+        return False
+
+def compress_many(root, name, count, verify, on_verified=None):
+    manager = CompressorManager()
+    results = []
+    for i in range(count):
+        src = os.path.join(root, f"{name}_{i}.txt")
+        with open(src, "wb") as f:
+            f.write(f"{name} {i} ".encode() * 5000)
+        cmd = manager.get_command("zstd", src, src + ".zst")
+        results.append(runner.run_compressor(cmd, src, src + ".zst", verify=verify, on_verified=on_verified))
+    return results
+
+def check_sampled(root):
+    runner._sample_counters.clear()
+    runs = 2 * runner.VERIFY_SAMPLE_EVERY + 1
+    with CountingVerifier() as verifier:
+        results = compress_many(root, "sampled", runs, "sampled")
+    policies = [r.get("verify") for r in results]
+    expected = ["full" if i % runner.VERIFY_SAMPLE_EVERY == 0 else "none" for i in range(runs)]
+    if not all(r.get("success") for r in results) or policies != expected or len(verifier.calls) != 3:
+        print(f"[FAIL] sampled: {len(verifier.calls)} tests for {runs} runs, policies {policies}")
+        return False
+    print(f"[OK] sampled: {len(verifier.calls)} of {runs} archives tested (runs 1, 11, 21)")
+    return True
+
+def check_deferred(root):
+    verified = []
+    with CountingVerifier() as verifier:
+        results = compress_many(root, "deferred", 4, "deferred",
+                                on_verified=lambda archive, ok, message: verified.append((archive, ok)))
+        runner.get_verify_queue().join()
+    archives = sorted(r.get("final_path") for r in results)
+    threads = {name for _, name in verifier.calls}
+    problems = []
+    if not all(r.get("success") and r.get("verify") == "deferred" for r in results):
+        problems.append(f"results {results}")
+    if sorted(a for a, _ in verifier.calls) != archives or threads != {"verify-queue"}:
+        problems.append(f"tests {verifier.calls}")
+    if sorted(verified) != [(a, True) for a in archives]:
+        problems.append(f"callbacks {verified}")
+    if problems:
+        print(f"[FAIL] deferred: {'; '.join(problems)}")
+        return False
+    print(f"[OK] deferred: {len(archives)} archives tested on the verify-queue thread, callbacks ok")
+    return True
+
+def check_writable_cache(root):
+    folder = os.path.join(root, "out")
+    os.makedirs(folder)
+    problems = []
+    if not runner.check_writable(folder):
+        problems.append("fresh folder not writable")
+    if os.name != "nt" and os.geteuid() != 0: # root ignores permission bits
+        os.chmod(folder, stat.S_IRUSR | stat.S_IXUSR)
+        if runner.check_writable(folder):
+            problems.append("still cached as writable after chmod 500")
+        os.chmod(folder, stat.S_IRWXU)
+        if not runner.check_writable(folder):
+            problems.append("not writable again after chmod 700")
+    # Same path, different object: the cached success must not carry over
+    os.rmdir(folder)
+    with open(folder, "w") as f:
+        f.write("not a folder")
+    if runner.check_writable(folder):
+        problems.append("cached success survived the folder being replaced by a file")
+    os.remove(folder)
+    if problems:
+        print(f"[FAIL] writable cache: {'; '.join(problems)}")
+        return False
+    print("[OK] writable cache: re-probed after the folder's permissions / identity changed")
+    return True
+
+def shell_job(root, name, script, timeout=30, **kwargs):
+    """run_compressor kwargs for `sh -c script` that ends by writing <name>.out."""
+    output = os.path.join(root, f"{name}.out")
+    return dict(cmd=["sh", "-c", f"{script} && echo done > '{output}'"], input_path=output,
+                output_path=output, timeout=timeout, verify="none", **kwargs)
+
+def hung_job(root, name, timeout=30):
+    """A job that never finishes on its own (a direct child, like a real engine binary)."""
+    output = os.path.join(root, f"{name}.out")
+    return dict(cmd=["sleep", "10"], input_path=output, output_path=output, timeout=timeout, verify="none")
+
+async def watch_children(stop, peak):
+    """Samples the number of live child processes until `stop` is set."""
+    while not stop.is_set():
+        peak[0] = max(peak[0], len(psutil.Process().children()))
+        await asyncio.sleep(0.01)
+
+def async_checks(root):
+    problems = []
+
+    async def concurrency_cap():
+        stop, peak = asyncio.Event(), [0]
+        watcher = asyncio.ensure_future(watch_children(stop, peak))
+        jobs = [shell_job(root, f"cap{i}", "sleep 0.3") for i in range(6)]
+        start = time.perf_counter()
+        results = await async_runner.AsyncRunner(concurrency=2).run_many(jobs)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await watcher
+        if not all(r["success"] for r in results) or peak[0] != 2 or elapsed < 0.85:
+            problems.append(f"cap: peak {peak[0]} processes, {elapsed:.2f}s, {results}")
+        return f"6 jobs, at most {peak[0]} processes, {elapsed:.2f}s"
+
+    async def per_job_timeout():
+        jobs = [hung_job(root, "slow", timeout=0.3), shell_job(root, "quick", "true")]
+        start = time.perf_counter()
+        slow, quick = await async_runner.AsyncRunner(concurrency=2).run_many(jobs)
+        elapsed = time.perf_counter() - start
+        if slow["success"] or "timed out after 0.3" not in slow["error"] or not quick["success"] or elapsed > 3:
+            problems.append(f"timeout: {slow} / {quick} after {elapsed:.2f}s")
+        return f"slow job failed after {elapsed:.2f}s, quick job unaffected"
+
+    async def cancel_kills():
+        task = asyncio.ensure_future(async_runner.run_compressor(**hung_job(root, "cancelled")))
+        await asyncio.sleep(0.3)
+        running = len(psutil.Process().children())
+        start = time.perf_counter()
+        task.cancel()
+        try:
+            await task
+            problems.append("cancel: task finished normally")
+        except asyncio.CancelledError:
+            pass
+        elapsed = time.perf_counter() - start
+        if not running or elapsed > 2:
+            problems.append(f"cancel: {running} processes running, cancel took {elapsed:.2f}s")
+        return f"cancelled job's process killed in {elapsed:.2f}s"
+
+    async def progress():
+        seen = []
+        job = shell_job(root, "progress", "printf '10%%\\r50.5%% done\\r' && printf '100%%\\n' >&2",
+                        on_progress=lambda percent, line: seen.append(percent))
+        result = await async_runner.run_compressor(**job)
+        if not result["success"] or sorted(seen) != [10.0, 50.5, 100.0]:
+            problems.append(f"progress: {seen} {result}")
+        return f"percentages {sorted(seen)} from stdout and stderr"
+
+    async def parity():
+        manager = CompressorManager()
+        src = os.path.join(root, "parity.txt")
+        with open(src, "wb") as f:
+            f.write(b"parity " * 100000)
+        pairs = []
+        for name, cmd_for in (("zstd", lambda out: manager.get_command("zstd", src, out)),
+                              ("failing", lambda out: manager.get_command("zstd", src + ".missing", out)),
+                              ("no engine", lambda out: None)):
+            sync_out, async_out = os.path.join(root, f"sync_{name}.zst"), os.path.join(root, f"async_{name}.zst")
+            with contextlib.redirect_stdout(io.StringIO()): # the sync runner prints its diagnostics
+                expected = runner.run_compressor(cmd_for(sync_out), src, sync_out, verify="full")
+            actual = await async_runner.run_compressor(cmd_for(async_out), src, async_out, verify="full")
+            comparable = lambda r: {k: v for k, v in r.items() if k not in ("time", "final_path", "error")}
+            if (set(expected) != set(actual) or comparable(expected) != comparable(actual)
+                    or expected.get("error", "").split(":")[0] != actual.get("error", "").split(":")[0]):
+                problems.append(f"parity ({name}): {expected} != {actual}")
+            pairs.append(name)
+        return f"same result dicts as runner.run_compressor ({', '.join(pairs)})"
+
+    results = []
+    for name, check in (("concurrency cap", concurrency_cap), ("per-job timeout", per_job_timeout),
+                        ("cancel", cancel_kills), ("progress", progress), ("result parity", parity)):
+        before = len(problems)
+        detail = asyncio.run(check())
+        children = leftover_children()
+        if children:
+            problems.append(f"{name}: children not reaped: {children}")
+        ok = len(problems) == before
+        print(f"[{'OK' if ok else 'FAIL'}] async {name}: {detail if ok else problems[-1]}")
+        results.append(ok)
+    return results
+
+def test_runner():
+    root = setup_test_env()
+    results = []
+
+    print("\n--- Runner: Streaming ---")
+    if not all(shutil.which(tool) for tool in ("cat", "zstd", "tar", "sleep")):
+        print("[FAIL] stream checks need cat, zstd, tar and sleep on PATH")
+        results.append(False)
+    else:
+        results.extend(stream_checks(root))
+
+    print("\n--- Runner: Verify Policies ---")
+    if not CompressorManager().available("zstd"):
+        print("[FAIL] verify policy checks need zstd")
+        results.append(False)
+    else:
+        results.append(check_sampled(root))
+        results.append(check_deferred(root))
+    results.append(check_writable_cache(root))
+
+    print("\n--- Runner: asyncio Runner ---")
+    if not CompressorManager().available("zstd"):
+        print("[FAIL] async checks need zstd")
+        results.append(False)
+    else:
+        results.extend(async_checks(root))
+
+    shutil.rmtree(root, ignore_errors=True)
+    return all(results)
+
+if __name__ == "__main__":
+    ok = test_runner()
+    print("\n=== RUNNER VERIFICATION", "PASSED ===" if ok else "FAILED ===")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,192 @@
+import os
+import shutil
+import sys
+import threading
+import time
+
+# Add current dir to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from PIL import Image
+
+import analyzer
+import selector
+from metadata import CompressionDB
+
+CONSTRAINTS = {"priority": "size", "max_time": 3600}
+
+def setup_test_env():
+    test_root = os.path.join(current_dir, "selector_workspace")
+    if os.path.exists(test_root):
+        shutil.rmtree(test_root)
+    os.makedirs(test_root)
+    return test_root
+
+def pin_system_state(**fields):
+    """Unstarted sampler with a fixed snapshot, so decisions do not follow the live machine."""
+    sampler = selector.SystemStateSampler(interval=3600) # never stale during the run
+    sampler.snapshot = {'timestamp': sampler.snapshot['timestamp'], 'net_kbps': 0.0, 'on_battery': False,
+                        'battery_pct': 100, 'ram_gb': 16.0, **fields}
+    selector._sampler = sampler
+    return sampler
+
+def check_compressed_image_profile(root):
+    """A decision on an already-compressed image must not leak into the shared profile."""
+    jpeg = os.path.join(root, "noise.jpg")
+    Image.frombytes("RGB", (512, 512), os.urandom(512 * 512 * 3)).save(jpeg, quality=95)
+    image = analyzer.sample_features(jpeg, use_cache=False)
+    if not image or image['entropy'] < 7.9 or not image['visual']['is_image']:
+        print(f"[FAIL] noise JPEG not seen as an optimized image: {image}")
+        return False
+
+    probes = [
+        image,
+        {'entropy': 4.5, 'repetition': 0.3, 'size_bytes': 4 * 1024 * 1024, 'is_text': True, 'visual': {}},
+        {'entropy': 6.0, 'repetition': 0.0, 'size_bytes': 2 * 1024 * 1024, 'visual': {'is_image': True}},
+        {'entropy': 7.95, 'repetition': 0.0, 'size_bytes': 50 * 1024 * 1024, 'visual': {'is_video': True}},
+    ]
+    profile = selector.get_perf_profile()
+    table = dict(profile.items())
+    before = [selector.get_best_tool(f, CONSTRAINTS) for f in probes]
+
+    for _ in range(5):
+        selector.get_best_tool(image, CONSTRAINTS)
+
+    after = [selector.get_best_tool(f, CONSTRAINTS) for f in probes]
+    current = selector.get_perf_profile()
+    problems = []
+    if current is not profile or current.version != profile.version:
+        problems.append(f"profile replaced: {profile!r} -> {current!r}")
+    if dict(current.items()) != table:
+        problems.append("profile values changed")
+    if after != before:
+        problems.append(f"decisions changed: {before} -> {after}")
+    if [selector.get_best_tool(f, CONSTRAINTS, profile) for f in probes] != before:
+        problems.append("explicit profile decides differently")
+    if problems:
+        print(f"[FAIL] compressed image: {'; '.join(problems)}")
+        return False
+    print(f"[OK] compressed image: profile {profile!r} untouched, decisions stable {before}")
+    return True
+
+def check_system_state_cache():
+    """Reads return the cached snapshot without touching psutil; a stale one is re-sampled."""
+    sampler = selector.SystemStateSampler(interval=60).start() # thread's next sample is a minute away
+    selector._sampler = sampler
+    problems = []
+    try:
+        cached = sampler.snapshot
+        # A writer holding the sample lock (a slow psutil call) must not block readers
+        with sampler._sample_lock:
+            reader = threading.Thread(target=lambda: [selector.get_system_state() for _ in range(10000)])
+            start = time.perf_counter()
+            reader.start()
+            reader.join(2.0)
+            elapsed = time.perf_counter() - start
+        if reader.is_alive():
+            problems.append("cached read blocked on a running sample")
+        elif elapsed > 0.5:
+            problems.append(f"10000 cached reads took {elapsed:.3f}s")
+        if selector.get_system_state() is not cached:
+            problems.append("fresh snapshot was re-sampled")
+
+        sampler.snapshot = dict(cached, timestamp=time.time() - 3600)
+        state = selector.get_system_state()
+        if state is cached or time.time() - state['timestamp'] > 5 or sampler.snapshot is not state:
+            problems.append(f"stale snapshot returned as is: {state}")
+        elif set(state) != set(cached):
+            problems.append(f"direct sample has different fields: {sorted(state)}")
+    finally:
+        sampler.stop()
+    if problems:
+        print(f"[FAIL] system state: {'; '.join(problems)}")
+        return False
+    print(f"[OK] system state: cached reads never block ({elapsed * 100:.1f} us each), stale snapshot re-sampled")
+    return True
+
+def close(a, b):
+    return all(abs(x - y) < 1e-6 for x, y in zip(a, b))
+
+def check_learned_model(root):
+    """Fit from history, the add_model_run upsert and the runs / (runs + prior) blend."""
+    problems = []
+    missing = os.path.join(root, "absent", "history.db")
+    try:
+        CompressionDB(missing, create=False)
+        problems.append("reader created a missing database")
+    except FileNotFoundError:
+        pass
+    if os.path.exists(os.path.dirname(missing)):
+        problems.append("reader created the database folder")
+
+    # Fit: a model cell is the running mean of its runs (ratio, MB/s)
+    db = CompressionDB(os.path.join(root, "history.db"))
+    mb = 1024 * 1024
+    history = [("zstd", 4 * mb, 0.5, 1.0), ("zstd", 4 * mb, 0.3, 2.0), ("7zip", 4 * mb, 1.0, 8.0)]
+    for engine, size, ratio, duration in history:
+        db.log_run("f.txt", size, int(size * ratio), 4.2, engine, duration, False, is_text=True)
+    selector.LEARNED_MODEL = None
+    model = selector.get_learned_model(db)
+    bucket = selector.feature_bucket(4.2, 4 * mb, True)
+    if set(model) != {("zstd", bucket), ("7zip", bucket)} or not close(model[("zstd", bucket)], (2, 0.4, 3.0)):
+        problems.append(f"fitted model {model}")
+    if db.get_model() != model:
+        problems.append("fitted model not persisted")
+
+    # Upsert: concurrent writers never lose a run
+    threads = [threading.Thread(target=lambda: [db.add_model_run("paq", "b", 0.2, 1.0) for _ in range(10)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    first = db.add_model_run("webp", "b", 0.6, 10.0)
+    second = db.add_model_run("webp", "b", 0.2, 30.0)
+    if not close(db.get_model()[("paq", "b")], (80, 0.2, 1.0)):
+        problems.append(f"concurrent upserts: {db.get_model()[('paq', 'b')]}")
+    if not close(first, (1, 0.6, 10.0)) or not close(second, (2, 0.4, 20.0)):
+        problems.append(f"upsert running mean: {first} then {second}")
+
+    # Blend: weight runs / (runs + MODEL_PRIOR_RUNS) on the learned cell
+    features = {'entropy': 4.2, 'size_bytes': 4 * mb, 'is_text': True}
+    prior = selector.MODEL_PRIOR_RUNS
+    for runs in (1, 3, 30):
+        selector.LEARNED_MODEL = {("zstd", bucket): (runs, 0.2, 100.0)}
+        weight = runs / (runs + prior)
+        expected = (weight * 0.2 + (1 - weight) * 0.6, weight * 100.0 + (1 - weight) * 40.0)
+        if not close(selector.learned_estimate("zstd", features, 0.6, 40.0), expected):
+            problems.append(f"blend at {runs} runs")
+    if selector.learned_estimate("7zip", features, 0.6, 40.0) != (0.6, 40.0):
+        problems.append("engine without history is not the prior")
+    selector.LEARNED_MODEL = {}
+
+    if problems:
+        print(f"[FAIL] learned model: {'; '.join(problems)}")
+        return False
+    print("[OK] learned model: fitted from history, upserts are atomic running means, blend weight runs/(runs+3)")
+    return True
+
+def test_selector():
+    root = setup_test_env()
+    selector.LEARNED_MODEL = {} # Heuristics only: no history database
+    results = []
+
+    print("\n--- Selector: System State ---")
+    results.append(check_system_state_cache())
+    pin_system_state()
+
+    print("\n--- Selector: Profile Isolation ---")
+    results.append(check_compressed_image_profile(root))
+
+    print("\n--- Selector: Learned Model ---")
+    results.append(check_learned_model(root))
+
+    shutil.rmtree(root, ignore_errors=True)
+    return all(results)
+
+if __name__ == "__main__":
+    ok = test_selector()
+    print("\n=== SELECTOR VERIFICATION", "PASSED ===" if ok else "FAILED ===")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,330 @@
+import os
+import shutil
+import sys
+import random
+import filecmp
+
+# Add current dir to sys.path to import local modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from engine_v3.core import AdaptiveEngineV3
+from engine_v3.container import AdaptiveContainer
+from engine_v3.parallel import read_at
+
+BIN_DIR = os.path.join(parent_dir, "bin")
+
+def setup_test_env():
+    test_root = os.path.join(current_dir, "v3_workspace")
+    if os.path.exists(test_root):
+        shutil.rmtree(test_root)
+    os.makedirs(test_root)
+    return test_root
+
+def create_mixed_file(path, sections=12):
+    """Alternating text / random regions so the aggregator emits many blocks."""
+    with open(path, "wb") as f:
+        for i in range(sections):
+            if i % 3 == 0:
+                f.write(os.urandom(700 * 1024))
+            else:
+                f.write(b"adaptive engine log line %d\n" % i * 30000)
+
+def check_roundtrip(label, engine, src, root):
+    archive = os.path.join(root, os.path.basename(src) + ".adaptive")
+    out_dir = os.path.join(root, f"out_{label}")
+    engine.compress_file(src, archive)
+    restored = engine.decompress_file(archive, out_dir)
+    if filecmp.cmp(src, restored, shallow=False):
+        print(f"[OK] {label}: round-trip identical")
+        return True
+    print(f"[FAIL] {label}: restored file differs")
+    return False
+
+def check_dedup(root):
+    """A file holding the same random payload three times should store it roughly once."""
+    src = os.path.join(root, "repeated.bin")
+    payload = os.urandom(2 * 1024 * 1024)
+    with open(src, "wb") as f:
+        f.write(payload + b"separator" + payload + payload)
+
+    engine = AdaptiveEngineV3(BIN_DIR, workers=2, chunking="cdc",
+                              cdc_sizes=(16 * 1024, 64 * 1024, 256 * 1024))
+    if not check_roundtrip("dedup round-trip", engine, src, root):
+        return False
+
+    archive = os.path.join(root, "repeated.bin.adaptive")
+    manifest = AdaptiveContainer.read_manifest(archive)
+    refs = sum(1 for block in manifest if block['algo'] == 'REF')
+    stored = len(manifest) - refs
+    ratio = os.path.getsize(archive) / os.path.getsize(src)
+
+    # References are served from their source block: one decode per stored block
+    decodes = []
+    decompress_block = engine._decompress_block
+    engine._decompress_block = lambda *args: decodes.append(1) or decompress_block(*args)
+    engine.decompress_file(archive, os.path.join(root, "dedup_restore"))
+    engine._decompress_block = decompress_block
+    if refs and ratio < 0.5 and len(decodes) == stored:
+        print(f"[OK] dedup: {refs} chunk references, archive at {ratio:.0%} of input, "
+              f"{stored} blocks decoded once each")
+        return True
+    print(f"[FAIL] dedup: {refs} references, archive at {ratio:.0%} of input, "
+          f"{len(decodes)} decodes for {stored} stored blocks")
+    return False
+
+def check_tree(root):
+    """A folder of small mixed files plus one large file packs into one archive and restores intact."""
+    tree = os.path.join(root, "tree")
+    os.makedirs(os.path.join(tree, "logs", "old"))
+    os.makedirs(os.path.join(tree, "blobs"))
+    for i in range(30):
+        with open(os.path.join(tree, "logs", f"run{i}.log"), "wb") as f:
+            f.write(b"adaptive engine log line %d\n" % i * (50 + i))
+        with open(os.path.join(tree, "blobs", f"blob{i}.bin"), "wb") as f:
+            f.write(os.urandom(4096 + i))
+    open(os.path.join(tree, "logs", "old", "empty.txt"), "wb").close()
+    if os.name != 'nt':
+        # ':' is an ordinary filename character outside Windows
+        with open(os.path.join(tree, "logs", "backup-2026-10-18T04:00.log"), "wb") as f:
+            f.write(b"timestamped backup log\n" * 100)
+    create_mixed_file(os.path.join(tree, "large.bin"), sections=4)
+
+    engine = AdaptiveEngineV3(BIN_DIR, workers=2)
+    archive = os.path.join(root, "tree.adaptive")
+    engine.compress_file(tree, archive)
+    if not engine.verify_file(archive)['ok']:
+        print("[FAIL] tree: verify_file rejects the archive")
+        return False
+    restored = engine.decompress_file(archive, os.path.join(root, "out_tree"))
+
+    count = 0
+    for dirpath, _, names in os.walk(tree):
+        for name in names:
+            rel = os.path.relpath(os.path.join(dirpath, name), tree)
+            copy = os.path.join(restored, rel)
+            if not os.path.isfile(copy) or not filecmp.cmp(os.path.join(tree, rel), copy, shallow=False):
+                print(f"[FAIL] tree: {rel} differs after restore")
+                return False
+            count += 1
+    print(f"[OK] tree: {count} files restored from one container")
+    return True
+
+def check_dictionaries(root):
+    """Small TEXT blocks between binary regions should shrink with a per-label dictionary."""
+    from engine_v3.codecs import zstandard
+    if zstandard is None:
+        print("[SKIP] dictionaries: zstandard is not installed")
+        return True
+
+    src = os.path.join(root, "small_text.bin")
+    rng = random.Random(7)
+    with open(src, "wb") as f:
+        for i in range(200):
+            for _ in range(60):
+                f.write(b'{"service": "api-%d", "level": "%s", "path": "/srv/app/module%d/handler.py"}\n'
+                        % (rng.randint(0, 20), rng.choice([b"info", b"warn", b"error"]), rng.randint(0, 50)))
+            f.write(os.urandom(16 * 1024))
+
+    sizes = {}
+    for use_dict in (False, True):
+        engine = AdaptiveEngineV3(BIN_DIR, workers=2, chunking="cdc", dictionaries=use_dict,
+                                  cdc_sizes=(1024, 2048, 4096))
+        if not check_roundtrip(f"dictionaries={use_dict}", engine, src, root):
+            return False
+        manifest = AdaptiveContainer.read_manifest(os.path.join(root, "small_text.bin.adaptive"))
+        stored = sum(b['end'] - b['start'] for b in manifest if b['type'] == 'TEXT')
+        sizes[use_dict] = stored + sum(end - start for start, end in manifest.meta.get('dicts', {}).values())
+        manifest.close()
+
+    if sizes[True] < sizes[False]:
+        print(f"[OK] dictionaries: TEXT blocks {sizes[False]} -> {sizes[True]} bytes (dictionary included)")
+        return True
+    print(f"[FAIL] dictionaries: TEXT blocks {sizes[False]} -> {sizes[True]} bytes")
+    return False
+
+def check_manifest_index(root):
+    """Binary manifest lookups must agree with a linear scan of the blocks."""
+    archive = os.path.join(root, "mixed.bin.adaptive")
+    AdaptiveEngineV3(BIN_DIR).compress_file(os.path.join(root, "mixed.bin"), archive)
+    with AdaptiveContainer.read_manifest(archive) as manifest:
+        blocks = list(manifest)
+        for offset in (0, manifest.total_size // 2, manifest.total_size - 1):
+            expected = next(b['id'] for b in blocks if b['out_offset'] <= offset < b['out_offset'] + b['orig_size'])
+            if manifest.find(offset) != expected:
+                print(f"[FAIL] manifest index: offset {offset} -> block {manifest.find(offset)}, expected {expected}")
+                return False
+    print(f"[OK] manifest index: {len(blocks)} blocks, O(log n) offset lookups match")
+    return True
+
+def check_range_reads(root):
+    """Random reads through the archive must match the same slices of the source file."""
+    src = os.path.join(root, "mixed.bin")
+    archive = src + ".adaptive"
+    engine = AdaptiveEngineV3(BIN_DIR)
+    engine.compress_file(src, archive)
+    with open(src, "rb") as f:
+        original = f.read()
+
+    rng = random.Random(7)
+    with engine.open_reader(archive) as reader:
+        for _ in range(50):
+            offset = rng.randrange(len(original))
+            length = rng.randrange(1, 3 * 1024 * 1024)
+            reader.seek(offset)
+            if reader.read(length) != original[offset:offset + length]:
+                print(f"[FAIL] range read at {offset} (+{length}) differs")
+                return False
+    if engine.read_range(archive, len(original) - 10, 100) != original[-10:]:
+        print("[FAIL] read_range past EOF")
+        return False
+
+    # Readers skip the whole-manifest CRC on open; verify_file still catches a bad one
+    stale_crc = os.path.join(root, "stale_crc.adaptive")
+    shutil.copy(archive, stale_crc)
+    with open(stale_crc, "r+b") as f:
+        f.seek(-11, os.SEEK_END) # footer: size (8), CRC (4), signature (7)
+        crc = f.read(1)
+        f.seek(-11, os.SEEK_END)
+        f.write(bytes([crc[0] ^ 0xFF]))
+    if engine.read_range(stale_crc, 1000, 5000) != original[1000:6000]:
+        print("[FAIL] range read needs the manifest CRC")
+        return False
+    if engine.verify_file(stale_crc, structural=True)['ok']:
+        print("[FAIL] verify_file missed a manifest CRC mismatch")
+        return False
+    print("[OK] range reads: 50 random seeks match the source, no manifest CRC on open")
+    return True
+
+def check_incremental(root):
+    """Re-archiving an edited file against its previous archive copies the untouched blocks."""
+    src = os.path.join(root, "mixed.bin")
+    base = os.path.join(root, "base.adaptive")
+    engine = AdaptiveEngineV3(BIN_DIR, workers=2, chunking="cdc",
+                              cdc_sizes=(64 * 1024, 256 * 1024, 1024 * 1024))
+    engine.compress_file(src, base)
+
+    edited = os.path.join(root, "edited.bin")
+    with open(src, "rb") as f:
+        data = f.read()
+    with open(edited, "wb") as f:
+        f.write(data[:len(data) // 2] + b"inserted line\n" * 100 + data[len(data) // 2:])
+
+    archive = edited + ".adaptive"
+    engine.compress_file(edited, archive, base=base)
+    with AdaptiveContainer.read_manifest(base) as old, AdaptiveContainer.read_manifest(archive) as new:
+        old_blocks = {bytes(read_at(base, b['start'], b['end'] - b['start'])) for b in old if b['algo'] != 'REF'}
+        copied = sum(bytes(read_at(archive, b['start'], b['end'] - b['start'])) in old_blocks
+                     for b in new if b['algo'] != 'REF')
+        total = len(new)
+    restored = engine.decompress_file(archive, os.path.join(root, "out_incremental"))
+    if not filecmp.cmp(edited, restored, shallow=False):
+        print("[FAIL] incremental: restored file differs")
+        return False
+    if copied < total // 2:
+        print(f"[FAIL] incremental: only {copied} of {total} blocks reused from the base")
+        return False
+    print(f"[OK] incremental: {copied} of {total} blocks copied from the base, round-trip identical")
+    return True
+
+def check_verify(root):
+    """verify_file passes a clean archive and pins a flipped byte to its block."""
+    src = os.path.join(root, "mixed.bin")
+    archive = os.path.join(root, "verify.adaptive")
+    engine = AdaptiveEngineV3(BIN_DIR, workers=2)
+    engine.compress_file(src, archive)
+    if not engine.verify_file(archive)['ok']:
+        print("[FAIL] verify: clean archive reported as damaged")
+        return False
+
+    with AdaptiveContainer.read_manifest(archive) as manifest:
+        target = manifest[len(manifest) // 2]
+    with open(archive, "r+b") as f:
+        f.seek(target['start'] + (target['end'] - target['start']) // 2)
+        byte = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    report = engine.verify_file(archive)
+    if report['ok'] or [c['id'] for c in report['corrupt']] != [target['id']]:
+        print(f"[FAIL] verify: expected block {target['id']} corrupt, got {report['corrupt']}")
+        return False
+    if not engine.verify_file(archive, structural=True)['ok']:
+        print("[FAIL] verify: structural check should not decode blocks")
+        return False
+    print(f"[OK] verify: corrupt block {target['id']} located without restoring")
+    return True
+
+def check_profile(root):
+    """A profiled run reports every pipeline stage, and the output matches an unprofiled run."""
+    from engine_v3.instrument import StageProfiler
+    src = os.path.join(root, "mixed.bin")
+    profiler = StageProfiler()
+    engine = AdaptiveEngineV3(BIN_DIR, workers=2, profiler=profiler)
+    if not check_roundtrip("profiled", engine, src, root):
+        return False
+    stages = profiler.report()['stages']
+    missing = {"slice", "classify", "hash", "aggregate", "compress", "container"} - set(stages)
+    if missing or stages["compress"]["bytes_in"] != os.path.getsize(src):
+        print(f"[FAIL] profile: missing stages {sorted(missing)} or wrong byte counts")
+        return False
+    print(f"[OK] profile: {len(stages)} stages, codecs {stages['compress'].get('codecs')}")
+    return True
+
+def test_v3_pipeline():
+    root = setup_test_env()
+    src = os.path.join(root, "mixed.bin")
+    create_mixed_file(src)
+
+    print("\n--- V3 Round-trip: Serial vs Parallel (compress + restore) ---")
+    results = [
+        check_roundtrip("serial", AdaptiveEngineV3(BIN_DIR), src, root),
+        check_roundtrip("threads", AdaptiveEngineV3(BIN_DIR, workers=4, window=4), src, root),
+        check_roundtrip("processes", AdaptiveEngineV3(BIN_DIR, workers=2, executor="process"), src, root),
+    ]
+
+    print("\n--- V3 Round-trip: Content-Defined Chunking ---")
+    cdc_engine = AdaptiveEngineV3(BIN_DIR, workers=2, chunking="cdc",
+                                  cdc_sizes=(64 * 1024, 256 * 1024, 1024 * 1024))
+    results.append(check_roundtrip("cdc slicer", cdc_engine, src, root))
+
+    print("\n--- V3 Block Deduplication ---")
+    results.append(check_dedup(root))
+
+    print("\n--- V3 Trained Dictionaries ---")
+    results.append(check_dictionaries(root))
+
+    print("\n--- V3 Directory Archives ---")
+    results.append(check_tree(root))
+
+    print("\n--- V3 Incremental Archives ---")
+    results.append(check_incremental(root))
+
+    print("\n--- V3 Manifest Formats ---")
+    results.append(check_roundtrip("legacy json manifest", AdaptiveEngineV3(BIN_DIR, manifest_format="json"), src, root))
+    results.append(check_manifest_index(root))
+
+    print("\n--- V3 Verification ---")
+    results.append(check_verify(root))
+
+    print("\n--- V3 Stage Profiling ---")
+    results.append(check_profile(root))
+
+    print("\n--- V3 Partial Extraction ---")
+    results.append(check_range_reads(root))
+
+    print("\n--- V3 Round-trip: Codec Backends ---")
+    for backend in ("library", "subprocess"):
+        engine = AdaptiveEngineV3(BIN_DIR, workers=2, backend=backend)
+        results.append(check_roundtrip(f"{backend} backend", engine, src, root))
+        engine = AdaptiveEngineV3(BIN_DIR, workers=2, backend=backend, selection="trial")
+        results.append(check_roundtrip(f"{backend} backend, trial selection", engine, src, root))
+
+    shutil.rmtree(root, ignore_errors=True)
+    return all(results)
+
+if __name__ == "__main__":
+    ok = test_v3_pipeline()
+    print("\n=== V3 VERIFICATION", "PASSED ===" if ok else "FAILED ===")
+    sys.exit(0 if ok else 1)